@@ -1,62 +1,92 @@
-import os
-from flask import Flask, jsonify
+from flask import Flask, jsonify, session
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_limiter.errors import RateLimitExceeded
 from authlib.integrations.flask_client import OAuth
-from urllib.parse import quote_plus
-from dotenv import load_dotenv
-from pymongo.mongo_client import MongoClient
-from pymongo.server_api import ServerApi
 
-load_dotenv()
+from app.mongo import DatabaseProxy, client_options, mongo_uri
 
 # --- Rate Limiter ---
-limiter = Limiter(key_func=get_remote_address, default_limits=["1000 per day", "200 per hour"])
+def rate_limit_key():
+    """Count signed-in users one by one; a whole campus can sit behind one NAT address."""
+    user = session.get("user")
+    if user and user.get("email"):
+        return "user:" + user["email"]
+    return "ip:" + get_remote_address()
+
+
+limiter = Limiter(key_func=rate_limit_key, default_limits=["1000 per day", "200 per hour"])
 
 # --- Global OAuth instance ---
 oauth = OAuth()
 
-def create_app():
+# --- MongoDB: connects lazily, once per process (see app/mongo.py) ---
+db = DatabaseProxy()
+
+def create_app(config_object="config.Config"):
     app = Flask(__name__)
-    app.secret_key = os.getenv("APP_SECRET_KEY")
+    app.config.from_object(config_object)
 
     # --- Auth0 Setup ---
     oauth.init_app(app)
     oauth.register(
         "auth0",
-        client_id=os.getenv("AUTH0_CLIENT_ID"),
-        client_secret=os.getenv("AUTH0_CLIENT_SECRET"),
+        client_id=app.config["AUTH0_CLIENT_ID"],
+        client_secret=app.config["AUTH0_CLIENT_SECRET"],
         client_kwargs={"scope": "openid profile email"},
-        server_metadata_url=f'https://{os.getenv("AUTH0_DOMAIN")}/.well-known/openid-configuration'
+        server_metadata_url=f'https://{app.config["AUTH0_DOMAIN"]}/.well-known/openid-configuration'
     )
 
-    # --- MongoDB Setup ---
-    mongo_user = os.getenv("MONGO_USER")
-    mongo_password = os.getenv("MONGO_PASSWORD")
-    mongo_cluster = os.getenv("MONGO_CLUSTER")
-    mongo_db = os.getenv("MONGO_DB")
+    # --- Metrics: /metrics, Server-Timing, per-endpoint MongoDB command stats ---
+    from app import metrics
+    metrics.init_app(app)
 
-    if not mongo_password:
-        raise ValueError("MONGO_PASSWORD is missing in .env")
+    # --- MongoDB Setup (no connection yet: that happens in the warm-up, see app/health.py) ---
+    from app import query_audit
+    options = client_options(app.config)
+    # The audit listener does nothing unless a request or `flask db audit-queries` is capturing
+    options["event_listeners"] = [query_audit.query_capture]
+    if app.config["METRICS"]:
+        options["event_listeners"].append(metrics.command_metrics)
+    db.configure(mongo_uri(app.config), app.config["MONGO_DB"], **options)
 
-    mongo_password_encoded = quote_plus(mongo_password)
-    mongo_uri = (
-        f"mongodb+srv://{mongo_user}:{mongo_password_encoded}@{mongo_cluster}/{mongo_db}"
-        "?retryWrites=true&w=majority&appName=SomoCluster"
-    )
+    # --- Query-plan audit (development only: explains each new query shape) ---
+    query_audit.init_app(app)
+
+    # --- Ticket counter write-behind (off unless TICKET_COUNTER_BUFFER is set) ---
+    from app.counters import ticket_counters
+    ticket_counters.init_app(app, db)
 
-    global client, db
-    client = MongoClient(mongo_uri, server_api=ServerApi("1"))
-    db = client.get_database(mongo_db)
+    # --- Event lifecycle: move ended events to events_archive periodically ---
+    from app.lifecycle import event_archiver
+    event_archiver.init_app(app, db)
+
+    # --- Response cache for shared event feeds ---
+    from app.cache import response_cache
+    response_cache.init_app(app)
+
+    # --- JSON responses: orjson encoding, ETags, conditional GET, compression ---
+    from app import responses
+    responses.init_app(app)
+
+    # --- CLI ---
+    from app.cli import db_cli
+    app.cli.add_command(db_cli)
 
     # --- Rate Limiter ---
+    if app.config["RATELIMIT_STORAGE_URI"].startswith(("redis://", "rediss://")):
+        timeout = app.config["RATELIMIT_STORAGE_TIMEOUT_MS"] / 1000
+        app.config.setdefault("RATELIMIT_STORAGE_OPTIONS", {"socket_timeout": timeout, "socket_connect_timeout": timeout})
     limiter.init_app(app)
 
     @app.errorhandler(RateLimitExceeded)
     def handle_rate_limit(e):
         return jsonify({"error": "Too many requests"}), 429
 
+    # --- Health probes and background warm-up ---
+    from app import health
+    health.init_app(app)
+
     # --- Blueprints ---
     from app.views import views_bp
     from app.api import api_bp
@@ -1,30 +1,54 @@
-import math
+import json
+import base64
 import datetime
 from bson import ObjectId
+from bson.errors import InvalidId
 from flask import Blueprint, jsonify, request, session
-from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
-from flask_limiter.errors import RateLimitExceeded
-from app import db
-from bson import ObjectId
+from app import db, limiter
+from app.cache import custom_tag, event_tag, location_tag, response_cache
+from app.concurrency import gather
+from app.loaders import load_events, load_optins, reserved_event_ids
+from app.counters import ticket_counters
+from app.lifecycle import not_ended
+from app.reservations import ALREADY_RESERVED, NOT_FOUND, SOLD_OUT, reserve
+from app.search import SCOPE_FIELDS, event_search
+from app.universities import universities
 
 api_bp = Blueprint("api", __name__)
 
-# --- Rate Limiter ---
-limiter = Limiter(key_func=get_remote_address, default_limits=["1000 per day", "200 per hour"])
+# --- Pagination ---
+OPTINS_PAGE_SIZE = 50
+OPTINS_MAX_PAGE_SIZE = 100
+EVENTS_PAGE_SIZE = 50
+EVENTS_MAX_PAGE_SIZE = 100
+EVENTS_PER_CAMPUS = 10
+SEARCH_MAX_RESULTS = 1000
+
+# Keyset order for /events: (field, direction), with _id as the tie-breaker
+EVENT_SORTS = {
+    "upcoming": ("start_time", 1),
+    "latest": ("created_at", -1),
+}
+
+# --- Event views ---
+# Everything serialize_event can return, in response order. "summary" is the
+# first CARD_SUMMARY_CHARS of the description, cut by MongoDB before it's sent.
+EVENT_FIELDS = (
+    "_id", "title", "description", "summary", "location", "open_to", "start_time", "end_time",
+    "ticket_price", "is_free", "image_url", "created_by", "created_at", "tickets_sold",
+    "capacity", "is_custom_location", "service_fee", "reserved",
+)
+EVENT_VIEWS = {
+    # What the list UI's cards render; the rest is one GET /events/<id> away
+    "card": ("_id", "title", "summary", "location", "start_time", "end_time", "image_url",
+             "ticket_price", "is_free", "tickets_sold", "capacity", "is_custom_location", "reserved"),
+    "full": tuple(f for f in EVENT_FIELDS if f != "summary"),
+}
+CARD_SUMMARY_CHARS = 200
 
 # -----------------------------
 # Helpers
 # -----------------------------
-def haversine(lat1, lon1, lat2, lon2):
-    """Calculate distance between two lat/lng points in km."""
-    R = 6371
-    dlat = math.radians(lat2 - lat1)
-    dlon = math.radians(lon2 - lon1)
-    a = math.sin(dlat/2)**2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon/2)**2
-    return R * (2 * math.atan2(math.sqrt(a), math.sqrt(1 - a)))
-
-
 def parse_datetime(value):
     if not value:
         return None
@@ -34,41 +58,168 @@ def parse_datetime(value):
         return None
 
 
-def serialize_event(event, user_email=None):
-    """Serialize events consistently for API responses."""
-    def to_iso(val):
-        if val is None:
+def encode_cursor(values):
+    """Pack pagination state into an opaque, URL-safe token."""
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Inverse of encode_cursor. Returns None for a malformed token."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    return values if isinstance(values, dict) else None
+
+
+def cursor_value(value):
+    """Make a sort key JSON-safe for a cursor (datetimes become tagged ISO strings)."""
+    if isinstance(value, datetime.datetime):
+        return {"$date": value.isoformat()}
+    return value
+
+
+def parse_cursor_value(value):
+    if isinstance(value, dict):
+        return datetime.datetime.fromisoformat(value["$date"])
+    return value
+
+
+def keyset_after(field, direction, value, last_id):
+    """Filter for documents strictly after ``(value, last_id)`` in ``(field, _id)`` order.
+
+    MongoDB sorts null/missing before everything else, so a null key is the
+    first thing in ascending order and the last thing in descending order.
+    """
+    if direction == 1:
+        if value is None:
+            return {"$or": [{field: None, "_id": {"$gt": last_id}}, {field: {"$ne": None}}]}
+        return {"$or": [{field: {"$gt": value}}, {field: value, "_id": {"$gt": last_id}}]}
+
+    if value is None:
+        return {"$or": [{field: None, "_id": {"$lt": last_id}}]}
+    return {"$or": [{field: {"$lt": value}}, {field: value, "_id": {"$lt": last_id}}, {field: None}]}
+
+
+def is_past_event(event, now=None):
+    """True once an event has ended (or started, if it has no end_time)."""
+    ends = event.get("end_time") or event.get("start_time")
+    if not isinstance(ends, datetime.datetime):
+        return False
+    if ends.tzinfo is not None:
+        ends = ends.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return ends < (now or datetime.datetime.utcnow())
+
+
+def overlay_reserved(events, user_email):
+    """Copy serialized (cacheable) events with this user's ``reserved`` flag filled in.
+
+    Events whose view doesn't include ``reserved`` are returned as they are.
+    """
+    # Ids are ObjectIds from the memory cache and strings from Redis
+    reserved = {str(eid) for eid in reserved_event_ids(user_email)}
+    return [dict(e, reserved=str(e["_id"]) in reserved) if "reserved" in e else e for e in events]
+
+
+def requested_event_fields():
+    """Event fields asked for with ``?fields=a,b`` or ``?view=card|full`` (default full).
+
+    Returns a tuple in EVENT_FIELDS order that always starts with ``_id``,
+    or None if the view or a field name is unknown.
+    """
+    raw = request.args.get("fields")
+    if raw:
+        names = {f.strip() for f in raw.split(",") if f.strip()}
+        if not names or not names <= set(EVENT_FIELDS):
             return None
-        if isinstance(val, str):
-            return val
-        if hasattr(val, "isoformat"):
-            return val.isoformat()
-        return str(val)
-
-    reserved = False
-    if user_email:
-        user = db.user_optins.find_one({"email": user_email})
-        if user and ObjectId(event["_id"]) in user.get("events", []):
-            reserved = True
+        return ("_id",) + tuple(f for f in EVENT_FIELDS if f in names and f != "_id")
+    return EVENT_VIEWS.get(request.args.get("view", "full").lower())
 
-    return {
-        "_id": str(event["_id"]),
+
+def event_projection(fields, *required):
+    """MongoDB projection for serializing ``fields``, plus stored fields the caller needs.
+
+    A list whose stored fields all sit in the query's index (say
+    ``fields=start_time`` on a campus feed) is answered as a covered query.
+    """
+    projection = {name: 1 for name in fields + required if name not in ("summary", "reserved")}
+    if "summary" in fields:
+        projection["summary"] = {"$substrCP": [{"$ifNull": ["$description", ""]}, 0, CARD_SUMMARY_CHARS]}
+    return projection
+
+
+def serialize_event(event, user_email=None, fields=EVENT_VIEWS["full"]):
+    """Serialize events consistently for API responses, keeping only ``fields``.
+
+    BSON values (ObjectId, datetime) are left as they are; the app's JSON
+    provider encodes them (see app/responses.py).
+    """
+    # Reservations are fetched once per request, not once per event
+    reserved = bool(user_email) and ObjectId(event["_id"]) in reserved_event_ids(user_email)
+
+    data = {
+        "_id": event["_id"],
         "title": event.get("title"),
         "description": event.get("description"),
+        "summary": event.get("summary"),
         "location": event.get("location"),
         "open_to": event.get("open_to"),
-        "start_time": to_iso(event.get("start_time")),
-        "end_time": to_iso(event.get("end_time")),
+        "start_time": event.get("start_time"),
+        "end_time": event.get("end_time"),
         "ticket_price": event.get("ticket_price"),
         "is_free": event.get("is_free"),
         "image_url": event.get("image_url"),
         "created_by": event.get("created_by"),
-        "created_at": to_iso(event.get("created_at")),
-        "tickets_sold": int(event.get("tickets_sold", 0)),
+        "created_at": event.get("created_at"),
+        "tickets_sold": int(event.get("tickets_sold", 0)) + ticket_counters.pending(event["_id"]),
+        "capacity": event.get("capacity"),
         "is_custom_location": bool(event.get("is_custom_location", False)),
         "service_fee": float(event.get("service_fee", 0.0)),
         "reserved": reserved,
-   }
+    }
+    return {name: data[name] for name in fields}
+
+
+def events_by_campus(campus_names, per_campus=EVENTS_PER_CAMPUS, projection=None):
+    """Soonest events that haven't ended for several campuses, in a single aggregation.
+
+    Events store their campus as the exact university name in ``location``
+    (see create_event), so this is an equality ``$in`` that the
+    (location, start_time) index serves in order. Returns
+    ``{campus_name: [event, ...]}`` with at most ``per_campus`` events each,
+    trimmed to ``projection`` if one is given.
+    """
+    if not campus_names:
+        return {}
+    pipeline = [
+        {"$match": {"location": {"$in": list(campus_names)}, **not_ended()}},
+        {"$sort": {"location": 1, "start_time": 1}},
+    ]
+    if projection:
+        pipeline.append({"$project": dict(projection, location=1)})
+    pipeline += [
+        {"$group": {"_id": "$location", "events": {"$firstN": {"input": "$$ROOT", "n": per_campus}}}},
+    ]
+    return {row["_id"]: row["events"] for row in db.events.aggregate(pipeline)}
+
+
+def cached_events_by_campus(campus_names, fields=EVENT_VIEWS["full"]):
+    """events_by_campus, serialized and shared through the response cache."""
+    def build():
+        by_campus = events_by_campus(campus_names, projection=event_projection(fields))
+        return {name: [serialize_event(e, fields=fields) for e in events] for name, events in by_campus.items()}
+
+    def tags(by_campus):
+        return [location_tag(name) for name in campus_names] + [
+            event_tag(e["_id"]) for events in by_campus.values() for e in events
+        ]
+
+    key = response_cache.make_key("campus_events", campuses=list(campus_names), fields=list(fields))
+    return response_cache.get_or_compute(key, build, tags)
 
 
 @api_bp.route("/universities/validate-domain", methods=["GET"])
@@ -82,8 +233,8 @@ def validate_university_domain():
                 "message": "Missing email domain."
             }), 400
 
-        # ✅ Check if domain exists in MongoDB
-        university = db.universities.find_one({"domain": domain})
+        # ✅ Check if domain belongs to a known university (cached registry, no DB hit)
+        university = universities.by_domain(domain)
 
         if not university:
             return jsonify({
@@ -115,10 +266,10 @@ def get_nearest_university():
 
         # If GPS missing, fallback to logged-in user's university
         if (not lat or not lng) and "user" in session:
-            uni = db.universities.find_one({"name": session["user"]["university"]})
+            uni = universities.by_name(session["user"]["university"])
             if uni:
                 return jsonify({
-                    "_id": str(uni["_id"]),
+                    "_id": uni["_id"],
                     "name": uni["name"],
                     "latitude": uni["latitude"],
                     "longitude": uni["longitude"],
@@ -135,13 +286,11 @@ def get_nearest_university():
         lat = float(lat)
         lng = float(lng)
 
-        universities = list(db.universities.find({}, {"name": 1, "latitude": 1, "longitude": 1, "type": 1}))
-        if not universities:
+        hits = universities.nearest(lat, lng, k=1)
+        if not hits:
             return jsonify({"error": "No universities found"}), 404
 
-        nearest = min(universities, key=lambda u: haversine(lat, lng, u["latitude"], u["longitude"]))
-        nearest["_id"] = str(nearest["_id"])
-        return jsonify(nearest), 200
+        return jsonify(hits[0][0]), 200
 
     except ValueError:
         return jsonify({"error": "Invalid lat/lng format"}), 400
@@ -150,8 +299,8 @@ def get_nearest_university():
 
 
 @api_bp.route("/universities/nearest_with_events")
-@limiter.limit("3 per minute")
-@limiter.limit("33 per hour")
+@limiter.limit("20 per minute")
+@limiter.limit("300 per hour")
 def nearest_with_events():
     try:
         lat = request.args.get("lat")
@@ -159,7 +308,7 @@ def nearest_with_events():
 
         # If no GPS → fallback to logged-in user's university
         if (not lat or not lng) and "user" in session:
-            uni = db.universities.find_one({"name": session["user"]["university"]})
+            uni = universities.by_name(session["user"]["university"])
             if uni:
                 lat = float(uni.get("latitude"))
                 lng = float(uni.get("longitude"))
@@ -173,28 +322,26 @@ def nearest_with_events():
         lat = float(lat)
         lng = float(lng)
         limit = min(request.args.get("limit", default=3, type=int), 3)
+        fields = requested_event_fields()
+        if fields is None:
+            return jsonify({"error": "Unknown view or fields"}), 400
 
         # Get nearest universities
-        universities = list(
-            db.universities.find({}, {"name": 1, "latitude": 1, "longitude": 1, "type": 1})
-        )
-        for uni in universities:
-            uni["distance_km"] = haversine(lat, lng, uni["latitude"], uni["longitude"])
-            uni["_id"] = str(uni["_id"])
-
-        universities.sort(key=lambda u: u["distance_km"])
-        nearest_unis = universities[:limit]
+        nearest_unis = []
+        for doc, distance_km in universities.nearest(lat, lng, k=limit):
+            nearest_unis.append(dict(doc, distance_km=distance_km))
 
         # Attach events to each university
         results = []
         user_email = session["user"]["email"] if "user" in session else None
 
+        # Campus events and the user's reservations are fetched side by side
+        by_campus, _ = gather(
+            lambda: cached_events_by_campus([uni["name"] for uni in nearest_unis], fields),
+            lambda: reserved_event_ids(user_email),
+        )
         for uni in nearest_unis:
-            query = {"location": {"$regex": uni["name"], "$options": "i"}}
-
-
-            events_cursor = db.events.find(query).sort("start_time", 1).limit(10)
-            events = [serialize_event(e, user_email) for e in events_cursor]
+            events = overlay_reserved(by_campus.get(uni["name"], []), user_email)
             results.append({"university": uni, "events": events})
 
         return jsonify(results), 200
@@ -207,8 +354,8 @@ def nearest_with_events():
 # Events
 # -----------------------------
 @api_bp.route("/events")
-@limiter.limit("5 per minute")
-@limiter.limit("33 per hour")
+@limiter.limit("30 per minute")
+@limiter.limit("600 per hour")
 def get_events():
     if "user" not in session:
         return jsonify({"error": "Unauthorized"}), 401
@@ -216,8 +363,13 @@ def get_events():
     search = request.args.get("search", "").strip()
     campus = request.args.get("campus", "").strip()
     limit = request.args.get("limit", type=int)
-    sort_param = request.args.get("sort", "upcoming").lower()
+    limit = min(limit, EVENTS_MAX_PAGE_SIZE) if limit and limit > 0 else EVENTS_PAGE_SIZE
+    cursor = request.args.get("cursor")
+    sort_param = request.args.get("sort", "relevance" if search else "upcoming").lower()
     is_custom_param = request.args.get("is_custom") or request.args.get("is_custom_location")
+    fields = requested_event_fields()
+    if fields is None:
+        return jsonify({"error": "Unknown view or fields"}), 400
 
     query = {}
 
@@ -227,11 +379,14 @@ def get_events():
             return jsonify({"error": "Acha ufala. DCI wako rada."}), 401
         query["owner_email"] = user_email
 
+    # Feeds only show what's still on; a host's own list can ask for past and archived events too
+    include_ended = request.args.get("include_ended") == "1" and "owner_email" in query
+
     if search:
-        query["title"] = {"$regex": search, "$options": "i"}
+        query["search"] = search
 
     if campus:
-        uni = db.universities.find_one({"name": {"$regex": f"^{campus}$", "$options": "i"}})
+        uni = universities.by_folded_name(campus)
         if uni:
             query["location"] = uni["name"]
 
@@ -252,15 +407,146 @@ def get_events():
         else:
             return jsonify([]) # no university info, return empty
 
-    # ✅ sorting
-    sort_field = ("created_at", -1) if sort_param == "latest" else ("start_time", 1)
-    events_cursor = db.events.find(query).sort([sort_field])
+    # ✅ sorting + keyset pagination (no skip(), so deep pages cost the same as page one)
+    if sort_param == "relevance" and search:
+        sort_key = "relevance"
+    else:
+        sort_key = "latest" if sort_param == "latest" else "upcoming"
+
+    state = None
+    if cursor:
+        state = parse_page_cursor(cursor, sort_key)
+        if state is None:
+            return jsonify({"error": "Invalid cursor"}), 400
+
+    # Hosted lists are per-user, so only the shared feeds go through the cache
+    def build():
+        return fetch_event_page(query, sort_key, limit, state, fields, include_ended)
+
+    def load_page():
+        if "owner_email" in query:
+            return build()
+        key = response_cache.make_key(
+            "events",
+            location=query.get("location"),
+            custom=query.get("is_custom_location"),
+            search=search.casefold(),
+            sort=sort_key,
+            limit=limit,
+            cursor=cursor or "",
+            fields=list(fields),
+        )
+        return response_cache.get_or_compute(key, build, lambda page: feed_tags(query, page["events"]))
+
+    # The page and the user's reservations don't depend on each other
+    page, _ = gather(load_page, lambda: reserved_event_ids(user_email))
+
+    response = jsonify(overlay_reserved(page["events"], user_email))
+    if page["next_cursor"]:
+        response.headers["X-Next-Cursor"] = page["next_cursor"]
+    return response
+
+
+def parse_page_cursor(cursor, sort_key):
+    """Decode and validate a /events cursor; None if it's unusable for ``sort_key``."""
+    state = decode_cursor(cursor)
+    if not state or state.get("sort") != sort_key:
+        return None
+    if sort_key == "relevance":
+        offset = state.get("offset")
+        return state if isinstance(offset, int) and offset >= 0 else None
+    try:
+        state["value"] = parse_cursor_value(state["value"])
+        state["id"] = ObjectId(state["id"])
+    except (KeyError, TypeError, ValueError, InvalidId):
+        return None
+    return state
+
+
+def fetch_event_page(filters, sort_key, limit, state, fields=EVENT_VIEWS["full"], include_ended=False):
+    """One page of serialized events for a /events query, without per-user fields.
+
+    ``filters`` holds the route's resolved filters; ``search`` is answered by
+    the in-process index and the rest by MongoDB. Events that have ended
+    are left out unless ``include_ended`` is set, which also pages through
+    ``events_archive`` (search only covers events not yet archived).
+    """
+    query = {k: v for k, v in filters.items() if k != "search"}
+    if not include_ended:
+        query.update(not_ended())
+    search_rank = None
+    if "search" in filters:
+        # Full-text matches come ranked from the in-process index, already narrowed to
+        # this feed's campus/custom/host so the cut-off can't drop its matches
+        scope = {field: query[field] for field in SCOPE_FIELDS if field in query}
+        hits = event_search.search(filters["search"], limit=SEARCH_MAX_RESULTS, scope=scope)
+        search_rank = {event_id: rank for rank, event_id in enumerate(hits)}
+        query["_id"] = {"$in": hits}
+
+    next_state = None
+    if sort_key == "relevance":
+        # Bounded by SEARCH_MAX_RESULTS, so ranking in Python is cheap. Only ids come
+        # back from the filtered query; just the page's events are loaded in full
+        offset = state["offset"] if state else 0
+        ranked = sorted((e["_id"] for e in db.events.find(query, {"_id": 1})), key=search_rank.__getitem__)
+        page = load_events(ranked[offset:offset + limit], event_projection(fields))
+        if len(ranked) > offset + limit:
+            next_state = {"sort": sort_key, "offset": offset + limit}
+    else:
+        field, direction = EVENT_SORTS[sort_key]
+        if state:
+            query["$or"] = keyset_after(field, direction, state["value"], state["id"])["$or"]
+
+        projection = event_projection(fields, field)  # the cursor needs the sort key
+        collections = [db.events, db.events_archive] if include_ended else [db.events]
+        page = []
+        for collection in collections:
+            page += collection.find(query, projection).sort([(field, direction), ("_id", direction)]).limit(limit + 1)
+        if len(collections) > 1:
+            # One page from each, merged in MongoDB's order (nulls first ascending); an
+            # event caught mid-archive is in both
+            page = list({e["_id"]: e for e in page}.values())
+            page.sort(key=lambda e: (e.get(field) is not None, e.get(field), e["_id"]), reverse=direction < 0)
+            page = page[:limit + 1]
+        if len(page) > limit:
+            page = page[:limit]
+            last = page[-1]
+            next_state = {"sort": sort_key, "value": cursor_value(last.get(field)), "id": str(last["_id"])}
+
+    return {
+        "events": [serialize_event(e, fields=fields) for e in page],
+        "next_cursor": encode_cursor(next_state) if next_state else None,
+    }
+
+
+def feed_tags(filters, events):
+    """Invalidation tags for a cached feed: its scope plus every event it shows."""
+    if "location" in filters:
+        tags = [location_tag(filters["location"])]
+    else:
+        tags = [custom_tag(filters.get("is_custom_location"))]
+    return tags + [event_tag(e["_id"]) for e in events]
+
+
+@api_bp.route("/events/<event_id>")
+def get_event(event_id):
+    """One event with every field, for the detail modal behind a card."""
+    try:
+        event_oid = ObjectId(event_id)
+    except InvalidId:
+        return jsonify({"error": "Event not found"}), 404
+
+    projection = event_projection(EVENT_VIEWS["full"])
+    event = db.events.find_one({"_id": event_oid}, projection)
+    if not event:
+        # Reservation history links to events the archive job has moved
+        event = db.events_archive.find_one({"_id": event_oid}, projection)
+    if not event:
+        return jsonify({"error": "Event not found"}), 404
 
-    if limit:
-        events_cursor = events_cursor.limit(limit)
+    user_email = session["user"]["email"] if "user" in session else None
+    return jsonify(serialize_event(event, user_email)), 200
 
-    events = [serialize_event(e, user_email) for e in events_cursor]
-    return jsonify(events)
 
 @api_bp.route("/events/<event_id>/reserve", methods=["POST"])
 def reserve_seat(event_id):
@@ -270,27 +556,23 @@ def reserve_seat(event_id):
         if not email:
             return jsonify({"error": "Email required"}), 400
 
-        event = db.events.find_one({"_id": ObjectId(event_id)})
-        if not event:
+        try:
+            event_oid = ObjectId(event_id)
+        except InvalidId:
             return jsonify({"error": "Event not found"}), 404
 
-        # Check if user already opted in
-        user = db.user_optins.find_one({"email": email})
-        if user and ObjectId(event_id) in user.get("events", []):
+        # Seat and opt-in are taken atomically; see app/reservations.py
+        outcome = reserve(db, event_oid, email, counters=ticket_counters)
+
+        if outcome == NOT_FOUND:
+            return jsonify({"error": "Event not found"}), 404
+        if outcome == SOLD_OUT:
+            return jsonify({"error": "This event is sold out."}), 409
+        if outcome == ALREADY_RESERVED:
             return jsonify({"message": "Already reserved this event."}), 200
 
-        # Add to user_optins (create if not exists)
-        db.user_optins.update_one(
-            {"email": email},
-            {"$addToSet": {"events": ObjectId(event_id)}},
-            upsert=True
-        )
-
-        # Increment tickets_sold only once
-        db.events.update_one(
-            {"_id": ObjectId(event_id)},
-            {"$inc": {"tickets_sold": 1}}
-        )
+        # Feeds showing this event now have a stale tickets_sold
+        response_cache.invalidate(event_tag(event_oid))
 
         return jsonify({"message": "Reservation successful!"}), 200
 
@@ -312,7 +594,8 @@ def create_event():
         image_url = data.get("image_url")
         open_to = (data.get("open_to") or "everyone").lower()
         start_time = parse_datetime(data.get("start_time"))
-        end_time = parse_datetime(data.get("end_time"))
+        # Feeds drop events once end_time passes, so one without an end time ends when it starts
+        end_time = parse_datetime(data.get("end_time")) or start_time
         is_free_raw = data.get("is_free")
         is_free = str(is_free_raw).lower() in ["true", "1", "yes", "on"]
 
@@ -325,6 +608,18 @@ def create_event():
             except (TypeError, ValueError):
                 ticket_price = 0.0
 
+        # Optional seat limit; reservations beyond it are rejected atomically
+        capacity = data.get("capacity")
+        if capacity in (None, ""):
+            capacity = None
+        else:
+            try:
+                capacity = int(capacity)
+            except (TypeError, ValueError):
+                return jsonify({"error": "capacity must be a whole number"}), 400
+            if capacity < 1:
+                return jsonify({"error": "capacity must be at least 1"}), 400
+
         # Parse custom flag (expected true/"true"/"1" etc. from front-end)
         is_custom = str(data.get("is_custom_location", False)).lower() in ["true", "1", "yes", "on"]
 
@@ -346,14 +641,16 @@ def create_event():
             "ticket_price": ticket_price,
             "is_free": is_free,
             "tickets_sold": 0,
+            "capacity": capacity,
             "is_custom_location": is_custom,
             "service_fee": service_fee,
             "created_at": datetime.datetime.utcnow(),
             "created_by": "roy.murwa@strathmore.edu",  # placeholder
         }
 
-        result = db.events.insert_one(event)
-        event["_id"] = str(result.inserted_id)
+        db.events.insert_one(event)
+        event_search.add(event)
+        response_cache.invalidate(location_tag(event["location"]), custom_tag(is_custom))
         return jsonify({"message": "Event created successfully", "event": serialize_event(event)}), 201
 
     except Exception as e:
@@ -361,20 +658,50 @@ def create_event():
         
 @api_bp.route("/user/optins", methods=["GET"])
 def get_user_optins():
+    """The user's reservations, a page at a time, in the order they were made.
+
+    ``events`` keeps the shape profile.js renders; ``upcoming`` and ``past``
+    split the same page by end time. Pass ``next_cursor`` back as ``cursor``
+    to fetch the following page.
+    """
     if "user" not in session:
         return jsonify({"error": "Unauthorized"}), 401
 
     user_email = session["user"]["email"]
+    limit = request.args.get("limit", default=OPTINS_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, OPTINS_MAX_PAGE_SIZE))
+    fields = requested_event_fields()
+    if fields is None:
+        return jsonify({"error": "Unknown view or fields"}), 400
+
+    cursor = request.args.get("cursor")
+    offset = 0
+    if cursor:
+        state = decode_cursor(cursor)
+        if not state or not isinstance(state.get("offset"), int) or state["offset"] < 0:
+            return jsonify({"error": "Invalid cursor"}), 400
+        offset = state["offset"]
 
     # Find the user's optins doc
-    optins = db.user_optins.find_one({"email": user_email})
-    if not optins:
-        return jsonify({"events": []})
-
-    events = []
-    for event_id in optins.get("events", []):
-        ev = db.events.find_one({"_id": ObjectId(event_id)})
-        if ev:
-            events.append(serialize_event(ev, user_email))
-
-    return jsonify({"events": events})
+    optins = load_optins(user_email)
+    event_ids = optins.get("events", []) if optins else []
+    page_ids = event_ids[offset:offset + limit]
+
+    # One $in query for the whole page, returned in reservation order
+    events, upcoming, past = [], [], []
+    now = datetime.datetime.utcnow()
+    # end_time/start_time decide upcoming vs past, whatever the view
+    for ev in load_events(page_ids, event_projection(fields, "start_time", "end_time")):
+        data = serialize_event(ev, user_email, fields)
+        events.append(data)
+        (past if is_past_event(ev, now) else upcoming).append(data)
+
+    next_offset = offset + len(page_ids)
+    next_cursor = encode_cursor({"offset": next_offset}) if next_offset < len(event_ids) else None
+
+    return jsonify({
+        "events": events,
+        "upcoming": upcoming,
+        "past": past,
+        "next_cursor": next_cursor,
+    })
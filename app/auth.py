@@ -1,36 +1,56 @@
-import os
-from flask import Blueprint, session, redirect, url_for, jsonify
+from flask import Blueprint, current_app, session, redirect, url_for, jsonify
 from app import oauth, db
+from app.universities import universities
 import datetime
 from urllib.parse import urlencode, quote_plus
 
 auth_bp = Blueprint("auth", __name__)
 
+# How long browsers may reuse /auth/session without asking again
+SESSION_MAX_AGE = 300
+
+
+def campus_context(university):
+    """The campus fields kept in the session so later requests needn't look them up."""
+    if not university:
+        return {"university_id": None, "latitude": None, "longitude": None}
+
+    def coord(value):
+        return float(value) if value is not None else None
+
+    return {
+        "university_id": str(university["_id"]),
+        "latitude": coord(university.get("latitude")),
+        "longitude": coord(university.get("longitude")),
+    }
+
 
 @auth_bp.route("/session")
 def get_session():
-    user = session["user"]
-    email = user["email"]
-    domain = email.split("@")[-1].lower()
-    picture = session["user"]["picture"]
-
-    # Fetch user's university based on domain
-    university = session["user"]["university"]
-    if domain:
-        uni_doc = db.universities.find_one({"domain": domain}, {"name": 1, "latitude": 1, "longitude": 1})
-        print(domain, uni_doc)
-        if uni_doc:            
-            latitude = uni_doc["latitude"]
-            longitude = uni_doc["longitude"]
-
-    return jsonify({
-        "email": email,
+    user = session.get("user")
+    if not user:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    # Sessions created before campus context was captured at login
+    if "university_id" not in user:
+        domain = user["email"].split("@")[-1].lower()
+        user = {**user, **campus_context(universities.by_domain(domain))}
+        session["user"] = user
+
+    response = jsonify({
+        "email": user["email"],
         "name": user.get("name"),
-        "picture": picture,
-        "latitude": float(latitude),
-        "longitude": float(longitude),
-        "university": university
-    }), 200
+        "picture": user.get("picture"),
+        "latitude": user.get("latitude"),
+        "longitude": user.get("longitude"),
+        "university": user.get("university")
+    })
+
+    # Served purely from the session cookie, so let the browser reuse it
+    # (the ETag and If-None-Match handling come from app/responses.py)
+    response.headers["Cache-Control"] = f"private, max-age={SESSION_MAX_AGE}"
+    response.vary.add("Cookie")
+    return response
 
 # -------------------------------
 # LOGIN
@@ -65,8 +85,8 @@ def callback():
     # ✅ Extract email domain
     domain = email.split("@")[-1].lower()
 
-    # ✅ Check if domain exists in universities collection
-    university = db.universities.find_one({"domain": domain})
+    # ✅ Check if domain exists in universities collection (cached registry)
+    university = universities.by_domain(domain)
     if not university:
         # 🚫 Deny access for non-university emails
         return redirect(url_for("views.home", error="Invalid university email"))
@@ -91,7 +111,8 @@ def callback():
         "email": email,
         "name": user_info.get("name", ""),
         "university": university["name"],
-        "picture": user_info.get("picture")
+        "picture": user_info.get("picture"),
+        **campus_context(university)
     }
 
     return redirect(url_for("views.home"))
@@ -104,6 +125,6 @@ def logout():
     session.clear()
     params = {
         "returnTo": url_for("views.home", _external=True),
-        "client_id": os.getenv("AUTH0_CLIENT_ID")
+        "client_id": current_app.config["AUTH0_CLIENT_ID"]
     }
-    return redirect(f"https://{os.getenv('AUTH0_DOMAIN')}/v2/logout?" + urlencode(params))
\ No newline at end of file
+    return redirect(f"https://{current_app.config['AUTH0_DOMAIN']}/v2/logout?" + urlencode(params))
\ No newline at end of file
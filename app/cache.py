@@ -0,0 +1,236 @@
+import json
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+import orjson
+
+from app.responses import json_bytes
+
+KEY_PREFIX = "comrades:cache:"
+# How long a tag's last invalidation is remembered; longer than any compute
+GENERATION_MEMORY_SECONDS = 300
+
+
+class MemoryBackend:
+    """In-process LRU. Each gunicorn worker has its own copy.
+
+    Every invalidation bumps a generation counter and records it against
+    its tags, for the most recent ``max_entries`` tags. A write whose
+    ``since`` generation predates what's remembered is treated as stale.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._tags = defaultdict(set)
+        # key -> its tags, so an evicted or replaced entry leaves no key behind in _tags
+        self._key_tags = {}
+        self._generation = 0
+        # tag -> generation of its last invalidation, oldest first
+        self._invalidated = OrderedDict()
+        self._forgotten = 0
+        self._lock = threading.Lock()
+
+    def generation(self):
+        return self._generation
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry, tags, expire_seconds, since=None):
+        tags = tuple(tags)
+        with self._lock:
+            if since is not None and self._changed_since(tags, since):
+                return
+            self._forget(key)
+            self._entries[key] = entry
+            self._key_tags[key] = tags
+            for tag in tags:
+                self._tags[tag].add(key)
+            while len(self._entries) > self.max_entries:
+                self._forget(next(iter(self._entries)))
+
+    def invalidate_tags(self, tags):
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                self._invalidated[tag] = self._generation
+                self._invalidated.move_to_end(tag)
+                for key in list(self._tags.get(tag, ())):
+                    self._forget(key)
+            while len(self._invalidated) > self.max_entries:
+                self._forgotten = self._invalidated.popitem(last=False)[1]
+
+    def _changed_since(self, tags, since):
+        """Whether any of ``tags`` may have been invalidated after ``since``; call with the lock held."""
+        return since < self._forgotten or any(self._invalidated.get(tag, 0) > since for tag in tags)
+
+    def _forget(self, key):
+        """Drop ``key`` and its place in every tag set; call with the lock held."""
+        self._entries.pop(key, None)
+        for tag in self._key_tags.pop(key, ()):
+            keys = self._tags[tag]
+            keys.discard(key)
+            if not keys:
+                del self._tags[tag]
+
+
+class RedisBackend:
+    """Shared cache so every worker sees the same entries and invalidations.
+
+    Needs the ``redis`` package. Tags are Redis sets of the keys they cover.
+    Entries are stored as JSON, so BSON values in a payload come back as
+    the strings the API would have sent anyway. The generation counter and
+    each tag's last invalidation live in Redis too, so a write is checked
+    against invalidations from every worker.
+    """
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("RESPONSE_CACHE=redis needs the 'redis' package installed") from e
+        self._redis = redis.Redis.from_url(url)
+        self._watch_error = redis.WatchError
+
+    def get(self, key):
+        raw = self._redis.get(KEY_PREFIX + key)
+        return orjson.loads(raw) if raw else None
+
+    def generation(self):
+        return int(self._redis.get(KEY_PREFIX + "generation") or 0)
+
+    def set(self, key, entry, tags, expire_seconds, since=None):
+        tags = tuple(tags)
+        generation_keys = [KEY_PREFIX + "invalidated:" + tag for tag in tags]
+        with self._redis.pipeline() as pipe:
+            try:
+                if since is not None and generation_keys:
+                    # An invalidation landing between this check and EXEC aborts the write
+                    pipe.watch(*generation_keys)
+                    if any(int(g) > since for g in pipe.mget(generation_keys) if g):
+                        return
+                    pipe.multi()
+                pipe.set(KEY_PREFIX + key, json_bytes(entry), ex=expire_seconds)
+                for tag in tags:
+                    pipe.sadd(KEY_PREFIX + "tag:" + tag, key)
+                    pipe.expire(KEY_PREFIX + "tag:" + tag, expire_seconds)
+                pipe.execute()
+            except self._watch_error:
+                pass
+
+    def invalidate_tags(self, tags):
+        generation = self._redis.incr(KEY_PREFIX + "generation")
+        for tag in tags:
+            self._redis.set(KEY_PREFIX + "invalidated:" + tag, generation, ex=GENERATION_MEMORY_SECONDS)
+            tag_key = KEY_PREFIX + "tag:" + tag
+            keys = [KEY_PREFIX + k.decode() for k in self._redis.smembers(tag_key)]
+            self._redis.delete(tag_key, *keys)
+
+
+class ResponseCache:
+    """Cache for computed API payloads, keyed by normalized query.
+
+    Entries are fresh for ``ttl`` seconds. With ``stale`` > 0 an expired entry
+    is still served for up to that many more seconds while one background
+    thread recomputes it (stale-while-revalidate), so a slow database delays
+    the refresh rather than the user. Writes call ``invalidate`` with the tags
+    they affect, which drops matching entries outright: an invalidated entry
+    is never served stale. A computation that was already running when one
+    of its tags was invalidated isn't stored, since it may predate the write.
+
+    Payloads must not contain per-user data; callers overlay that afterwards.
+    """
+
+    def __init__(self):
+        self.backend = None
+        self.ttl = 30
+        self.stale = 0
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        kind = app.config.get("RESPONSE_CACHE", "memory")
+        self.ttl = app.config.get("RESPONSE_CACHE_TTL", self.ttl)
+        self.stale = app.config.get("RESPONSE_CACHE_STALE", self.stale)
+        if kind == "memory":
+            self.backend = MemoryBackend(app.config.get("RESPONSE_CACHE_SIZE", 1024))
+        elif kind == "redis":
+            self.backend = RedisBackend(app.config["RESPONSE_CACHE_URL"])
+        else:
+            self.backend = None
+
+    @staticmethod
+    def make_key(namespace, **params):
+        return namespace + ":" + json.dumps(params, sort_keys=True, separators=(",", ":"))
+
+    def get_or_compute(self, key, compute, tags):
+        """Return the cached payload for ``key``, computing and storing it on a miss.
+
+        ``compute`` returns the payload; ``tags`` is a callable that maps a
+        payload to the invalidation tags it should be filed under.
+        """
+        if self.backend is None:
+            return compute()
+
+        now = time.time()
+        entry = self.backend.get(key)
+        if entry is not None:
+            if now < entry["fresh_until"]:
+                return entry["value"]
+            if now < entry["fresh_until"] + self.stale:
+                self._refresh_in_background(key, compute, tags)
+                return entry["value"]
+
+        return self._store(key, compute, tags)
+
+    def _store(self, key, compute, tags):
+        since = self.backend.generation()
+        value = compute()
+        entry = {"value": value, "fresh_until": time.time() + self.ttl}
+        self.backend.set(key, entry, tags(value), self.ttl + self.stale, since=since)
+        return value
+
+    def _refresh_in_background(self, key, compute, tags):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                self._store(key, compute, tags)
+            except Exception:
+                pass  # keep serving the stale copy until it ages out
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=run, name="cache-refresh", daemon=True).start()
+
+    def invalidate(self, *tags):
+        if self.backend is not None and tags:
+            self.backend.invalidate_tags(tags)
+
+
+response_cache = ResponseCache()
+
+
+# -----------------------------
+# Tags used by the event feeds
+# -----------------------------
+def location_tag(location):
+    return f"location:{location}"
+
+
+def custom_tag(is_custom):
+    return f"custom:{int(bool(is_custom))}"
+
+
+def event_tag(event_id):
+    return f"event:{event_id}"
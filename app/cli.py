@@ -0,0 +1,142 @@
+import datetime
+import json
+import os
+import time
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from app.counters import reconcile_ticket_counts
+from app.indexes import INDEXES, ensure_indexes, missing_indexes
+from app.lifecycle import archive_ended_events, backfill_end_times
+from app.query_audit import audit_routes, describe
+
+
+def _db():
+    # Configured by create_app, which the flask CLI runs before any command
+    from app import db
+    return db
+
+
+db_cli = AppGroup("db", help="Database maintenance commands.")
+
+
+@db_cli.command("ensure-indexes")
+def ensure_indexes_command():
+    """Create every index the API routes need."""
+    before = set(missing_indexes(_db()))
+    ensure_indexes(_db())
+    for collection, name in sorted(before):
+        click.echo(f"created {collection}.{name}")
+    click.echo(f"{len(before)} created, {sum(map(len, INDEXES.values())) - len(before)} already present")
+
+
+@db_cli.command("check-indexes")
+def check_indexes_command():
+    """List declared indexes that are missing; exits non-zero if any are."""
+    missing = missing_indexes(_db())
+    for collection, name in missing:
+        click.echo(f"missing {collection}.{name}")
+    if missing:
+        raise SystemExit(1)
+    click.echo("all indexes present")
+
+
+@db_cli.command("reconcile-tickets")
+def reconcile_tickets_command():
+    """Recompute every event's tickets_sold from user opt-ins."""
+    corrected = reconcile_ticket_counts(_db())
+    click.echo(f"{corrected} events corrected")
+
+
+@db_cli.command("archive-events")
+@click.option("--after-hours", default=None, type=int,
+              help="Archive events that ended this long ago. [default: EVENT_ARCHIVE_AFTER_HOURS]")
+@click.option("--batch-size", default=None, type=int, help="Events per bulk write. [default: EVENT_ARCHIVE_BATCH]")
+def archive_events_command(after_hours, batch_size):
+    """Move ended events from events to events_archive now, whatever the schedule.
+
+    Events without an end_time get their start_time as one first.
+    """
+    config = current_app.config
+    after = datetime.timedelta(hours=config["EVENT_ARCHIVE_AFTER_HOURS"] if after_hours is None else after_hours)
+    cutoff = datetime.datetime.utcnow() - after
+    batch_size = batch_size or config["EVENT_ARCHIVE_BATCH"]
+    t0 = time.perf_counter()
+    click.echo(f"{backfill_end_times(_db(), batch_size)} events without an end_time backfilled")
+    moved = archive_ended_events(_db(), cutoff, batch_size)
+    click.echo(f"{moved} events that ended before {cutoff:%Y-%m-%d %H:%M} UTC archived "
+               f"in {time.perf_counter() - t0:.1f}s")
+
+
+SEEDED_COLLECTIONS = ("events", "events_archive", "universities", "users", "user_optins")
+
+
+@db_cli.command("seed")
+@click.option("--events", default=1_000, show_default=True, help="Events to generate.")
+@click.option("--universities", default=20, show_default=True, help="Universities to generate.")
+@click.option("--users", default=1_000, show_default=True, help="Users to generate, with their opt-ins.")
+@click.option("--seed", "seed_value", default=42, show_default=True, help="Same seed and sizes, same data.")
+@click.option("--optins-per-user", default=6.0, show_default=True, help="Mean reservations per user.")
+@click.option("--batch-size", default=5_000, show_default=True, help="Documents per insert_many.")
+@click.option("--workers", default=os.cpu_count() or 1, show_default=True, help="Processes generating and inserting.")
+@click.option("--drop", is_flag=True, help="Empty the seeded collections first.")
+@click.option("--yes", is_flag=True, help="Don't ask before --drop.")
+def seed_command(events, universities, users, seed_value, optins_per_user, batch_size, workers, drop, yes):
+    """Load generated universities, users, opt-ins and events (see app/seed.py)."""
+    # Local: it pulls in numpy, which no other command needs
+    from app.seed import Dataset
+
+    db = _db()
+    if drop:
+        if not yes:
+            click.confirm(f"Delete every document in {', '.join(SEEDED_COLLECTIONS)} of {db.name}?", abort=True)
+        for collection in SEEDED_COLLECTIONS:
+            db.drop_collection(collection)
+    else:
+        # Generated ids repeat from run to run, so a second load would only collide
+        for collection in SEEDED_COLLECTIONS:
+            if db[collection].estimated_document_count():
+                raise click.ClickException(f"{collection} already has documents; pass --drop to replace them")
+
+    def report(collection, docs, seconds):
+        if docs is None:
+            click.echo(f"{collection}: {seconds:.1f}s")
+            return
+        rate = f", {docs / seconds:,.0f} docs/s" if docs and seconds else ""
+        click.echo(f"{collection}: {docs:,} in {seconds:.1f}s{rate}")
+
+    dataset = Dataset(events=events, universities=universities, users=users, seed=seed_value,
+                      optins_per_user=optins_per_user)
+    t0 = time.perf_counter()
+    total = dataset.load(db, batch_size=batch_size, workers=workers, report=report)
+    seconds = time.perf_counter() - t0
+    click.echo(f"total: {total:,} documents in {seconds:.1f}s, {total / seconds:,.0f} docs/s")
+
+
+@db_cli.command("audit-queries")
+@click.option("--email", help="User to send the requests as (default: any user with reservations).")
+@click.option("--ratio", default=10, show_default=True, help="Flag plans examining more docs per doc returned.")
+@click.option("--min-docs", default=100, show_default=True, help="Ignore plans examining fewer docs than this.")
+@click.option("--json", "as_json", is_flag=True, help="Print the findings as JSON.")
+def audit_queries_command(email, ratio, min_docs, as_json):
+    """Explain the queries the read-only API routes issue; exits non-zero if any scan.
+
+    Run against a database shaped like production (`flask db seed`):
+    on a near-empty one every plan looks cheap.
+    """
+    try:
+        findings = audit_routes(current_app, email, ratio=ratio, min_docs=min_docs)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    flagged = [f for f in findings if f["flagged"] or "error" in f]
+    if as_json:
+        click.echo(json.dumps(findings, indent=2, default=str))
+    else:
+        for finding in findings:
+            click.echo("\n".join(describe(finding)))
+        click.echo(f"{len(findings)} query shapes, {len(flagged)} flagged")
+    if flagged:
+        raise SystemExit(1)
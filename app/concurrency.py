@@ -0,0 +1,51 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from app.forksafe import PerProcess
+
+# Extra queries in flight at once per worker process when running on threads
+FANOUT_WORKERS = 16
+
+_executor = PerProcess(lambda: ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix="fanout"))
+
+
+def _gevent_patched():
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched("socket")
+
+
+def gather(*calls):
+    """Run independent zero-argument callables at the same time; return their results in order.
+
+    The first call runs on the calling thread and the rest alongside it,
+    each in a copy of the caller's context so Flask's request, session and
+    ``g`` work inside them. Calls must not write the same ``g`` keys. The
+    first exception raised is re-raised here.
+
+    Under gunicorn's gevent workers (``-k gevent``) the extra calls are
+    greenlets, so waiting on MongoDB yields to every other open request;
+    otherwise they run on a small per-process thread pool.
+    """
+    if len(calls) < 2:
+        return [call() for call in calls]
+    first, rest = calls[0], calls[1:]
+
+    if _gevent_patched():
+        import gevent
+        greenlets = [gevent.spawn(contextvars.copy_context().run, call) for call in rest]
+        try:
+            result = first()
+        finally:
+            gevent.joinall(greenlets)
+        return [result] + [g.get() for g in greenlets]
+
+    futures = [_executor.get().submit(contextvars.copy_context().run, call) for call in rest]
+    try:
+        result = first()
+    finally:
+        for f in futures:
+            f.exception()  # wait, so nothing outlives the request context
+    return [result] + [f.result() for f in futures]
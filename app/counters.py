@@ -0,0 +1,137 @@
+import atexit
+import threading
+from collections import defaultdict
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from app.forksafe import PerProcess
+
+# Max events whose capacity is remembered before the cache is cleared
+CAPACITY_CACHE_SIZE = 10_000
+
+
+class CounterBuffer:
+    """Write-behind buffer for ``events.tickets_sold``.
+
+    Reservations on a hot event would otherwise each ``$inc`` the same
+    document and queue on its lock. With the buffer enabled, deltas pile up
+    per event in memory and go out as one ``bulk_write`` every ``flush_ms``
+    or after ``max_ops`` increments, whichever comes first. Only events
+    without a ``capacity`` are buffered: capped events need the synchronous
+    conditional ``$inc`` to stay oversell-proof. The ``user_optins`` write
+    stays synchronous and is the source of truth; reconcile_ticket_counts()
+    rebuilds exact counts from it.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.flush_ms = 200
+        self.max_ops = 500
+        self._db = None
+        self._pending = defaultdict(int)
+        self._ops = 0
+        self._capacity = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._flusher = PerProcess(self._start_flusher)
+
+    def init_app(self, app, db):
+        self.enabled = app.config.get("TICKET_COUNTER_BUFFER", False)
+        self.flush_ms = app.config.get("TICKET_COUNTER_FLUSH_MS", self.flush_ms)
+        self.max_ops = app.config.get("TICKET_COUNTER_MAX_OPS", self.max_ops)
+        self._db = db
+        if self.enabled:
+            atexit.register(self.flush)
+
+    def _start_flusher(self):
+        # A forked worker's copy of the master's deltas isn't its to write
+        self._pending.clear()
+        self._ops = 0
+        thread = threading.Thread(target=self._run, name="ticket-counters", daemon=True)
+        thread.start()
+        return thread
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_ms / 1000)
+            self._wake.clear()
+            self.flush()
+
+    def is_uncapped(self, event_id):
+        """True/False once the event is known; None if it doesn't exist."""
+        if event_id not in self._capacity:
+            event = self._db.events.find_one({"_id": event_id}, {"capacity": 1})
+            if not event:
+                return None
+            if len(self._capacity) >= CAPACITY_CACHE_SIZE:
+                self._capacity.clear()
+            self._capacity[event_id] = event.get("capacity")
+        return self._capacity[event_id] is None
+
+    def incr(self, event_id, delta=1):
+        with self._lock:
+            self._flusher.get()
+            self._pending[event_id] += delta
+            self._ops += 1
+            if self._ops >= self.max_ops:
+                self._wake.set()
+
+    def pending(self, event_id):
+        """Delta this worker has buffered but not yet written for ``event_id``."""
+        return self._pending.get(event_id, 0)
+
+    def flush(self):
+        with self._lock:
+            if not self._pending:
+                return
+            batch, self._pending, self._ops = self._pending, defaultdict(int), 0
+
+        deltas = [(eid, delta) for eid, delta in batch.items() if delta]
+        requests = [UpdateOne({"_id": eid}, {"$inc": {"tickets_sold": delta}}) for eid, delta in deltas]
+        try:
+            if requests:
+                self._db.events.bulk_write(requests, ordered=False)
+        except BulkWriteError as e:
+            # Unordered: everything but the listed writes was applied
+            self._requeue(deltas[err["index"]] for err in e.details.get("writeErrors", ()))
+        except PyMongoError:
+            # Nothing is known to have been applied; try it all again on the next tick
+            self._requeue(deltas)
+
+    def _requeue(self, deltas):
+        with self._lock:
+            for eid, delta in deltas:
+                self._pending[eid] += delta
+                self._ops += 1
+
+
+ticket_counters = CounterBuffer()
+
+
+def reconcile_ticket_counts(db, batch_size=1000):
+    """Reset every event's ``tickets_sold`` to its number of opt-ins.
+
+    Returns how many events were corrected. Run it when the buffer is idle
+    (or accept that increments still in flight get counted on the next run).
+    """
+    counts = {
+        row["_id"]: row["count"]
+        for row in db.user_optins.aggregate([
+            {"$unwind": "$events"},
+            {"$group": {"_id": "$events", "count": {"$sum": 1}}},
+        ], allowDiskUse=True)
+    }
+
+    corrected = 0
+    requests = []
+    for event in db.events.find({}, {"tickets_sold": 1}):
+        actual = counts.get(event["_id"], 0)
+        if event.get("tickets_sold", 0) != actual:
+            requests.append(UpdateOne({"_id": event["_id"]}, {"$set": {"tickets_sold": actual}}))
+        if len(requests) >= batch_size:
+            corrected += db.events.bulk_write(requests, ordered=False).modified_count
+            requests = []
+    if requests:
+        corrected += db.events.bulk_write(requests, ordered=False).modified_count
+    return corrected
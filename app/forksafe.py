@@ -0,0 +1,52 @@
+"""Per-process state for objects that can't be inherited across fork.
+
+A gunicorn worker forked from a ``--preload`` master inherits the master's
+objects but none of its threads, and must not share its sockets. So
+anything that owns a background thread, a thread pool or a connection is
+built lazily, once in each process that uses it, through PerProcess.
+
+PerProcess's own lock is per process too, created on first use: a lock
+made at import time in a gunicorn master is a real OS lock even after a
+gevent worker monkey-patches, and a greenlet that yields while holding one
+blocks every other greenlet in the worker.
+"""
+import os
+import threading
+
+
+class PerProcess:
+    """What ``create(*args)`` returns, built on the first get() in each process."""
+
+    def __init__(self, create):
+        self._create = create
+        self._value = None
+        self._pid = None
+        self._locks = {}
+
+    def _lock(self):
+        # setdefault is atomic, so every thread of this process gets the same lock
+        return self._locks.setdefault(os.getpid(), threading.Lock())
+
+    def get(self, *args):
+        """This process's value; ``args`` go to ``create`` when it has to run."""
+        if self._pid != os.getpid():
+            with self._lock():
+                if self._pid != os.getpid():
+                    self._value = self._create(*args)
+                    self._pid = os.getpid()
+        return self._value
+
+    @property
+    def built(self):
+        """True once this process has its value."""
+        return self._pid == os.getpid()
+
+    def set(self, value):
+        """Use ``value`` in this process instead of calling ``create``."""
+        with self._lock():
+            self._value, self._pid = value, os.getpid()
+
+    def reset(self):
+        """Forget the value; the next get() creates a new one."""
+        with self._lock():
+            self._value = self._pid = None
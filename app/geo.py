@@ -0,0 +1,96 @@
+"""Vectorized (NumPy) nearest-campus ranking for batch jobs.
+
+Request paths use the scalar haversine and grid in app/spatial.py, which
+don't need NumPy; only code that ranks many points at once imports this.
+"""
+import numpy as np
+
+from app.spatial import EARTH_RADIUS_KM
+
+# Cap on query x campus distance cells computed at once by nearest_many (~32 MB)
+BATCH_CELLS = 4_000_000
+
+
+class CoordinateSet:
+    """University coordinates held in contiguous float64 arrays for batch ranking.
+
+    ``docs`` keeps the original documents so callers can map the indices
+    returned by ``nearest``/``nearest_many`` back to universities.
+    """
+
+    def __init__(self, lats, lngs, docs=None):
+        lats = np.ascontiguousarray(lats, dtype=np.float64)
+        lngs = np.ascontiguousarray(lngs, dtype=np.float64)
+        if lats.shape != lngs.shape or lats.ndim != 1:
+            raise ValueError("lats and lngs must be 1-D arrays of the same length")
+
+        self.docs = docs
+        self._lat = np.radians(lats)
+        self._lng = np.radians(lngs)
+        self._cos_lat = np.cos(self._lat)
+
+    @classmethod
+    def from_documents(cls, docs):
+        docs = list(docs)
+        lats = [d["latitude"] for d in docs]
+        lngs = [d["longitude"] for d in docs]
+        return cls(lats, lngs, docs)
+
+    def __len__(self):
+        return self._lat.shape[0]
+
+    def distances(self, lat, lng):
+        """Distance (km) from one point to every campus, in index order."""
+        return self._distances(np.radians([lat]), np.radians([lng]))[0]
+
+    def _distances(self, lat, lng):
+        # lat/lng are 1-D radian arrays of query points; result is (queries, campuses)
+        lat, lng = lat[:, None], lng[:, None]
+        a = (np.sin((self._lat - lat) / 2) ** 2
+             + np.cos(lat) * self._cos_lat * np.sin((self._lng - lng) / 2) ** 2)
+        return EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+    def nearest(self, lat, lng, k=1):
+        """Indices and distances of the k closest campuses to one point, closest first."""
+        idx, dist = self.nearest_many([lat], [lng], k)
+        return idx[0], dist[0]
+
+    def nearest_many(self, lats, lngs, k=1):
+        """Rank campuses for many query points at once.
+
+        Returns ``(indices, distances)``, both shaped ``(len(lats), k)`` and
+        sorted closest first per row. Only the top k are sorted: ``argpartition``
+        selects them in linear time, so cost is dominated by the distance
+        computation itself. Query points are processed in chunks so memory
+        stays bounded however many points are passed.
+        """
+        lats = np.radians(np.asarray(lats, dtype=np.float64).ravel())
+        lngs = np.radians(np.asarray(lngs, dtype=np.float64).ravel())
+        n = len(self)
+        k = min(k, n)
+        if k <= 0 or lats.size == 0:
+            return np.empty((lats.size, 0), dtype=np.intp), np.empty((lats.size, 0))
+
+        out_idx = np.empty((lats.size, k), dtype=np.intp)
+        out_dist = np.empty((lats.size, k), dtype=np.float64)
+        step = max(1, BATCH_CELLS // n)
+        for start in range(0, lats.size, step):
+            stop = start + step
+            dist = self._distances(lats[start:stop], lngs[start:stop])
+            if k < n:
+                top = np.argpartition(dist, k - 1, axis=1)[:, :k]
+            else:
+                top = np.broadcast_to(np.arange(n), dist.shape)
+            top_dist = np.take_along_axis(dist, top, axis=1)
+            order = np.argsort(top_dist, axis=1, kind="stable")
+            out_idx[start:stop] = np.take_along_axis(top, order, axis=1)
+            out_dist[start:stop] = np.take_along_axis(top_dist, order, axis=1)
+
+        return out_idx, out_dist
+
+    def within(self, lat, lng, radius_km):
+        """Indices and distances of every campus within ``radius_km``, closest first."""
+        dist = self.distances(lat, lng)
+        idx = np.flatnonzero(dist <= radius_km)
+        order = np.argsort(dist[idx], kind="stable")
+        return idx[order], dist[idx][order]
@@ -0,0 +1,141 @@
+import threading
+import time
+
+from flask import Blueprint, jsonify
+
+from app import db, limiter, oauth
+from app.forksafe import PerProcess
+
+health_bp = Blueprint("health", __name__)
+
+# Seconds between attempts while MongoDB is unreachable
+RETRY_SECONDS = 5
+
+
+def _ping(app):
+    db.command("ping")
+
+
+def _indexes(app):
+    from app.indexes import warn_missing_indexes
+    warn_missing_indexes(app, db)
+
+
+def _universities(app):
+    from app.universities import universities
+    universities.warm()
+
+
+def _search(app):
+    from app.search import event_search
+    event_search.warm()
+
+
+def _oidc(app):
+    # authlib fetches this on the first login otherwise
+    oauth.auth0.load_server_metadata()
+
+
+# In order; the first one gates readiness and is retried until it succeeds
+STEPS = [
+    ("mongo", _ping),
+    ("indexes", _indexes),
+    ("universities", _universities),
+    ("search", _search),
+    ("oidc", _oidc),
+]
+
+
+class WarmUp:
+    """The slow parts of startup, run on a background thread in each worker.
+
+    create_app does no network I/O, so a new worker can answer requests as
+    soon as it's forked. This thread then resolves the Atlas SRV record and
+    connects, checks indexes, loads the university registry and search
+    index, and fetches Auth0's OIDC metadata, so those costs land here
+    instead of on the first user who needs them. Until MongoDB has
+    answered, /readyz returns 503; a failed connection is retried every
+    RETRY_SECONDS. Other failed steps are logged and don't hold up
+    readiness.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.steps = {}
+        self._connected = threading.Event()
+        self._thread = PerProcess(self._begin)
+
+    def start(self, app):
+        """Start warming this process, once per pid; cheap to call on every request."""
+        self._thread.get(app)
+
+    def _begin(self, app):
+        self.steps = {}
+        self._connected = threading.Event()
+        thread = threading.Thread(target=self._run, args=(app,), name="warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def _run(self, app):
+        with app.app_context():
+            while not self._step(app, *STEPS[0]):
+                time.sleep(RETRY_SECONDS)
+            self._connected.set()
+            for name, fn in STEPS[1:]:
+                self._step(app, name, fn)
+
+    def _step(self, app, name, fn):
+        t0 = time.perf_counter()
+        try:
+            fn(app)
+        except Exception as e:
+            self.steps[name] = {"ok": False, "ms": round((time.perf_counter() - t0) * 1e3, 1), "error": str(e)}
+            app.logger.warning("Warm-up step %s failed: %s", name, e)
+            return False
+        self.steps[name] = {"ok": True, "ms": round((time.perf_counter() - t0) * 1e3, 1)}
+        return True
+
+    @property
+    def ready(self):
+        """MongoDB has answered; the other steps only save the first requests some time.
+
+        Always true with WARM_UP off: nothing would ever mark the worker ready.
+        """
+        return not self.enabled or self._connected.is_set()
+
+
+warm_up = WarmUp()
+
+
+def init_app(app):
+    app.register_blueprint(health_bp)
+
+    warm_up.enabled = app.config.get("WARM_UP", True)
+    if warm_up.enabled:
+        # gunicorn.conf.py starts it once each worker is up; this covers `flask run` and friends
+        @app.before_request
+        def ensure_warm_up():
+            warm_up.start(app)
+
+
+# -----------------------------
+# Probes
+# -----------------------------
+@health_bp.route("/healthz")
+@limiter.exempt
+def liveness():
+    """The process is up and serving requests."""
+    response = jsonify({"status": "ok"})
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+
+@health_bp.route("/readyz")
+@limiter.exempt
+def readiness():
+    """200 once this worker has reached MongoDB; 503 until then. ``steps`` shows the warm-up's progress."""
+    ready = warm_up.ready
+    response = jsonify({"status": "ready" if ready else "warming", "steps": warm_up.steps})
+    response.status_code = 200 if ready else 503
+    response.headers["Cache-Control"] = "no-store"
+    return response
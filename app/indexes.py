@@ -0,0 +1,106 @@
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import PyMongoError
+
+# Feed indexes only cover events with an end_time: every feed filters on
+# end_time >= now (app/lifecycle.py), which MongoDB can answer from an index
+# with this filter. ($exists would also match end_time: null.) Events from
+# before end_time was required get one from lifecycle.backfill_end_times().
+# A partial filter can't refer to the current time; the archive job is what
+# keeps ended events out of the collection.
+DATED_EVENTS = {"end_time": {"$type": "date"}}
+
+# Indexes the API's queries rely on, by collection. Compound indexes that
+# back a sorted feed end in _id so keyset pagination's (sort key, _id) order
+# is read straight off the index.
+INDEXES = {
+    "events": [
+        # /events?sort=upcoming and nearest_with_events, per campus
+        IndexModel([("location", ASCENDING), ("start_time", ASCENDING), ("_id", ASCENDING)],
+                   name="location_start_time", partialFilterExpression=DATED_EVENTS),
+        # /events?sort=latest, per campus
+        IndexModel([("location", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+                   name="location_created_at", partialFilterExpression=DATED_EVENTS),
+        # /events?is_custom=1 feeds, which span every campus
+        IndexModel([("is_custom_location", ASCENDING), ("start_time", ASCENDING), ("_id", ASCENDING)],
+                   name="custom_start_time", partialFilterExpression=DATED_EVENTS),
+        IndexModel([("is_custom_location", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+                   name="custom_created_at", partialFilterExpression=DATED_EVENTS),
+        # /events?hosted=1 (the profile page's "hosted" list)
+        IndexModel([("owner_email", ASCENDING), ("start_time", ASCENDING), ("_id", ASCENDING)],
+                   name="owner_start_time", partialFilterExpression=DATED_EVENTS),
+        IndexModel([("owner_email", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+                   name="owner_created_at", partialFilterExpression=DATED_EVENTS),
+    ],
+    "universities": [
+        # Login domain check; sparse because older rows have no domain yet
+        IndexModel([("domain", ASCENDING)], name="domain_unique", unique=True, sparse=True),
+        # Session-university fallbacks and request loaders
+        IndexModel([("name", ASCENDING)], name="name"),
+    ],
+    "user_optins": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+}
+
+
+def _key(spec, partial=None):
+    # Server-reported directions may come back as floats (1.0); special index types stay strings
+    key = tuple((field, d if isinstance(d, str) else int(d)) for field, d in spec)
+    return key, repr(sorted((partial or {}).items()))
+
+
+def _declared_key(model):
+    return _key(model.document["key"].items(), model.document.get("partialFilterExpression"))
+
+
+def missing_indexes(db):
+    """Declared indexes that don't exist yet, as ``(collection, name)`` pairs.
+
+    An index with the right keys but a different partial filter counts as missing.
+    """
+    missing = []
+    for collection, models in INDEXES.items():
+        existing = {_key(info["key"], info.get("partialFilterExpression"))
+                    for info in db[collection].index_information().values()}
+        for model in models:
+            if _declared_key(model) not in existing:
+                missing.append((collection, model.document["name"]))
+    return missing
+
+
+def outdated_indexes(db):
+    """Indexes that have a declared name but not its keys or filter, as ``(collection, name)`` pairs."""
+    outdated = []
+    for collection, models in INDEXES.items():
+        existing = db[collection].index_information()
+        for model in models:
+            info = existing.get(model.document["name"])
+            if info and _key(info["key"], info.get("partialFilterExpression")) != _declared_key(model):
+                outdated.append((collection, model.document["name"]))
+    return outdated
+
+
+def ensure_indexes(db):
+    """Create every declared index, rebuilding any whose definition changed. Safe to run repeatedly.
+
+    Returns the declared index names per collection; createIndexes is a
+    no-op for indexes that already exist with the same spec. A rebuilt
+    index is dropped first, so queries that need it scan until it's back.
+    """
+    for collection, name in outdated_indexes(db):
+        db[collection].drop_index(name)
+    return {collection: db[collection].create_indexes(models) for collection, models in INDEXES.items()}
+
+
+def warn_missing_indexes(app, db):
+    """Log a warning for each declared index the database doesn't have."""
+    try:
+        missing = missing_indexes(db)
+    except PyMongoError as e:
+        app.logger.warning("Could not verify MongoDB indexes: %s", e)
+        return
+    for collection, name in missing:
+        app.logger.warning("Missing MongoDB index %s.%s, run `flask db ensure-indexes`", collection, name)
@@ -0,0 +1,174 @@
+"""Event lifecycle: feeds show events that haven't ended, and ended events move to ``events_archive``.
+
+``events`` is what every feed reads, so it should hold only events that
+are still coming up; then it and its indexes stay small enough for the
+working set to fit in RAM, however long the app has been running.
+
+- not_ended() is the window the feeds apply: ``end_time >= now``.
+- Events created before end_time was required have none; an event
+  without one ends when it starts. backfill_end_times() writes that down
+  as ``end_time = start_time``, so every event matches an end_time filter
+  and is covered by the partial feed indexes (app/indexes.py).
+- archive_ended_events() backfills, then moves events that ended before a
+  cutoff into ``events_archive``, a batch at a time: one bulk upsert into
+  the archive, then one delete from ``events``. Re-running it after a
+  failure is safe.
+- EventArchiver runs that every EVENT_ARCHIVE_INTERVAL seconds. Each
+  gunicorn worker has a thread for it, and a lease document in
+  ``job_leases`` makes sure only one of them does the work per interval.
+
+Reservations keep pointing at archived events, so /api/user/optins and
+/api/events/<id> read ``events_archive`` for ids ``events`` no longer has.
+"""
+import datetime
+import os
+import socket
+import threading
+import time
+
+from pymongo import ReplaceOne, UpdateOne
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from app.forksafe import PerProcess
+
+ARCHIVE_JOB = "archive-events"
+# Longest a worker waits between checks of the lease
+MAX_POLL_SECONDS = 60
+
+
+def not_ended(now=None):
+    """Filter for events that haven't ended yet."""
+    return {"end_time": {"$gte": now or datetime.datetime.utcnow()}}
+
+
+def ended_before(cutoff):
+    """Filter for events that ended before ``cutoff``."""
+    return {"end_time": {"$lt": cutoff}}
+
+
+def backfill_end_times(db, batch_size=1000):
+    """Set ``end_time = start_time`` on events that have no end_time. Returns how many were updated."""
+    updated = 0
+    while True:
+        batch = list(db.events.find({"end_time": None, "start_time": {"$type": "date"}},
+                                    {"start_time": 1}).limit(batch_size))
+        if not batch:
+            return updated
+        result = db.events.bulk_write([UpdateOne({"_id": event["_id"], "end_time": None},
+                                                 {"$set": {"end_time": event["start_time"]}})
+                                       for event in batch], ordered=False)
+        updated += result.modified_count
+        if len(batch) < batch_size:
+            return updated
+
+
+def archive_ended_events(db, cutoff, batch_size=1000, on_batch=None):
+    """Move events that ended before ``cutoff`` from ``events`` to ``events_archive``.
+
+    Events without an end_time are backfilled first. Each batch is copied
+    with one unordered bulk upsert, then deleted from ``events``. A batch
+    interrupted between the two is copied again on the next run.
+    ``on_batch`` is called with each batch's ids. Returns how many events
+    were moved.
+    """
+    backfill_end_times(db, batch_size)
+    moved = 0
+    while True:
+        batch = list(db.events.find(ended_before(cutoff)).limit(batch_size))
+        if not batch:
+            return moved
+        ids = [event["_id"] for event in batch]
+        db.events_archive.bulk_write([ReplaceOne({"_id": event["_id"]}, event, upsert=True) for event in batch],
+                                     ordered=False)
+        db.events.delete_many({"_id": {"$in": ids}})
+        moved += len(ids)
+        if on_batch:
+            on_batch(ids)
+        if len(batch) < batch_size:
+            return moved
+
+
+class EventArchiver:
+    """Runs archive_ended_events() periodically, in one worker at a time.
+
+    Every worker polls; the one that moves the ``job_leases`` document's
+    ``next_run`` forward does the work, the others get a duplicate key
+    error from the upsert and wait for the next interval.
+    """
+
+    def __init__(self):
+        self.interval = 0
+        self.after = datetime.timedelta(hours=24)
+        self.batch_size = 1000
+        self._app = None
+        self._db = None
+        self._thread = PerProcess(self._spawn)
+
+    def init_app(self, app, db):
+        self.interval = app.config.get("EVENT_ARCHIVE_INTERVAL", self.interval)
+        self.after = datetime.timedelta(hours=app.config.get("EVENT_ARCHIVE_AFTER_HOURS", 24))
+        self.batch_size = app.config.get("EVENT_ARCHIVE_BATCH", self.batch_size)
+        self._app = app
+        self._db = db
+        if not self.interval:
+            return
+
+        @app.before_request
+        def ensure_event_archiver():
+            self.start()
+
+    def start(self):
+        """Start this process's archiver thread, once per pid; cheap to call on every request."""
+        if self.interval:
+            self._thread.get()
+
+    def _spawn(self):
+        thread = threading.Thread(target=self._run, name="event-archiver", daemon=True)
+        thread.start()
+        return thread
+
+    def _claim(self, now):
+        """True if this worker took the lease for the current interval."""
+        try:
+            self._db.job_leases.find_one_and_update(
+                {"_id": ARCHIVE_JOB, "next_run": {"$lte": now}},
+                {"$set": {"next_run": now + datetime.timedelta(seconds=self.interval),
+                          "owner": f"{socket.gethostname()}:{os.getpid()}"}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            return False
+        return True
+
+    def run_once(self, now=None):
+        """Archive what's due if this worker holds the lease; returns how many events moved, or None."""
+        from app.cache import event_tag, response_cache
+        from app.search import event_search
+
+        now = now or datetime.datetime.utcnow()
+        if not self._claim(now):
+            return None
+
+        def forget(ids):
+            response_cache.invalidate(*map(event_tag, ids))
+            event_search.remove(*ids)
+
+        return archive_ended_events(self._db, now - self.after, self.batch_size, on_batch=forget)
+
+    def _run(self):
+        # Claim straight away, so a deploy's backfill doesn't wait a poll
+        while True:
+            try:
+                moved = self.run_once()
+            except PyMongoError as e:
+                self._app.logger.warning("Archiving ended events failed: %s", e)
+            except Exception:
+                # e.g. the cache backend is down; the thread must outlive it
+                self._app.logger.exception("Archiving ended events failed")
+            else:
+                if moved:
+                    self._app.logger.info("Archived %d ended events", moved)
+            time.sleep(min(self.interval, MAX_POLL_SECONDS))
+
+
+event_archiver = EventArchiver()
@@ -0,0 +1,105 @@
+from bson import ObjectId
+from flask import g
+from app import db
+
+
+class BatchLoader:
+    """DataLoader-style cache for one request.
+
+    Keys are deduplicated and every key that hasn't been seen yet is fetched
+    with a single call to ``batch_fn``, which takes a list of keys and returns
+    a ``{key: document}`` dict. Missing keys are cached as ``None`` so they are
+    never looked up twice.
+    """
+
+    def __init__(self, batch_fn):
+        self._batch_fn = batch_fn
+        self._cache = {}
+
+    def load(self, key):
+        return self.load_many([key])[0]
+
+    def load_many(self, keys):
+        keys = list(keys)
+        missing = [k for k in dict.fromkeys(keys) if k not in self._cache]
+        if missing:
+            found = self._batch_fn(missing)
+            for key in missing:
+                self._cache[key] = found.get(key)
+        return [self._cache[k] for k in keys]
+
+    def prime(self, key, value):
+        self._cache.setdefault(key, value)
+
+    def clear(self, key=None):
+        if key is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(key, None)
+
+
+# -----------------------------
+# Batch functions
+# -----------------------------
+def _fetch_optins(emails):
+    docs = db.user_optins.find({"email": {"$in": emails}})
+    return {d["email"]: d for d in docs}
+
+
+def _fetch_events(ids, projection=None):
+    docs = {d["_id"]: d for d in db.events.find({"_id": {"$in": ids}}, projection)}
+    # Ended events move to the archive (app/lifecycle.py); reservations still point at them
+    archived = [i for i in ids if i not in docs]
+    if archived:
+        docs.update((d["_id"], d) for d in db.events_archive.find({"_id": {"$in": archived}}, projection))
+    return docs
+
+
+_BATCH_FNS = {
+    "user_optins": _fetch_optins,
+    "events": _fetch_events,
+}
+
+
+# -----------------------------
+# Request-scoped access
+# -----------------------------
+def get_loader(name):
+    """Return the loader for ``name``, creating it on first use in this request."""
+    loaders = g.setdefault("loaders", {})
+    if name not in loaders:
+        loaders[name] = BatchLoader(_BATCH_FNS[name])
+    return loaders[name]
+
+
+def load_events(event_ids, projection=None):
+    """Load events by id in one round trip, preserving order and skipping missing ones.
+
+    With a ``projection`` the documents come from a separate loader, so a
+    trimmed document is never served to a caller expecting a whole one.
+    """
+    if projection is None:
+        loader = get_loader("events")
+    else:
+        loaders = g.setdefault("loaders", {})
+        name = "events:" + repr(sorted(projection.items()))
+        if name not in loaders:
+            loaders[name] = BatchLoader(lambda ids: _fetch_events(ids, projection))
+        loader = loaders[name]
+    docs = loader.load_many(ObjectId(eid) for eid in event_ids)
+    return [d for d in docs if d is not None]
+
+
+def load_optins(email):
+    return get_loader("user_optins").load(email)
+
+
+def reserved_event_ids(email):
+    """Set of event ObjectIds the user has reserved, looked up once per request."""
+    if not email:
+        return frozenset()
+    reserved = g.setdefault("reserved_event_ids", {})
+    if email not in reserved:
+        optins = load_optins(email)
+        reserved[email] = frozenset(optins.get("events", [])) if optins else frozenset()
+    return reserved[email]
@@ -0,0 +1,241 @@
+"""Request and MongoDB metrics: Prometheus on /metrics, and a Server-Timing header.
+
+/metrics needs METRICS_TOKEN as a bearer token, and Server-Timing is only
+sent in debug mode unless SERVER_TIMING says otherwise: both show anyone
+who can read them the app's endpoints and MongoDB timings.
+
+A pymongo CommandListener times every command and counts the documents it
+returns, attributed to the endpoint whose request issued it (gather()'s
+fan-out runs in a copy of the request's context, so its queries count
+too; commands outside a request count as "background"). Request hooks
+record latency and response size per endpoint, and the JSON provider
+(app/responses.py) reports serialization time and bytes.
+
+Under gunicorn each worker writes to PROMETHEUS_MULTIPROC_DIR (set up in
+gunicorn.conf.py) and /metrics adds every live worker's values together,
+so any worker can answer a scrape. Without that variable the metrics are
+per process, which is what ``flask run`` needs.
+"""
+import contextvars
+import hmac
+import os
+import threading
+import time
+
+from flask import Blueprint, Response, current_app, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess,
+)
+from pymongo import monitoring
+
+from app import limiter
+
+metrics_bp = Blueprint("metrics", __name__)
+
+# Requests that didn't match a route
+UNMATCHED = "unmatched"
+# Commands issued outside any request: warm-up, registry reloads, counter flushes
+BACKGROUND = "background"
+
+REQUEST_SECONDS = Histogram(
+    "comrades_http_request_duration_seconds", "Time to handle a request, by endpoint",
+    ["endpoint", "method", "status"],
+)
+RESPONSE_BYTES = Histogram(
+    "comrades_http_response_bytes", "Response body size as sent (after compression), by endpoint",
+    ["endpoint"], buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+)
+SERIALIZED_BYTES = Counter(
+    "comrades_json_serialized_bytes", "JSON bytes produced before compression, by endpoint", ["endpoint"],
+)
+SERIALIZE_SECONDS = Counter(
+    "comrades_json_serialize_seconds", "Time spent encoding JSON responses, by endpoint", ["endpoint"],
+)
+MONGO_COMMANDS = Counter(
+    "comrades_mongo_commands", "MongoDB commands issued, by endpoint, collection and command",
+    ["endpoint", "collection", "command"],
+)
+MONGO_SECONDS = Histogram(
+    "comrades_mongo_command_duration_seconds", "MongoDB command round-trip time, by collection and command",
+    ["collection", "command"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+MONGO_FAILURES = Counter(
+    "comrades_mongo_command_failures", "MongoDB commands that failed, by collection and command",
+    ["collection", "command"],
+)
+MONGO_DOCUMENTS = Counter(
+    "comrades_mongo_documents_returned", "Documents MongoDB sent back, by endpoint and collection",
+    ["endpoint", "collection"],
+)
+
+
+class RequestStats:
+    """What one request spent where; shared with its fan-out threads."""
+
+    __slots__ = ("endpoint", "started", "db_seconds", "db_commands", "json_seconds", "json_bytes",
+                 "compress_seconds", "lock")
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.db_seconds = self.json_seconds = self.compress_seconds = 0.0
+        self.db_commands = self.json_bytes = 0
+        self.lock = threading.Lock()
+
+
+_current = contextvars.ContextVar("request_stats", default=None)
+
+
+def record_serialization(seconds, nbytes):
+    """Called by the JSON provider for each body it encodes."""
+    stats = _current.get()
+    if stats is not None:
+        stats.json_seconds += seconds
+        stats.json_bytes += nbytes
+
+
+def record_compression(seconds):
+    stats = _current.get()
+    if stats is not None:
+        stats.compress_seconds += seconds
+
+
+# -----------------------------
+# MongoDB commands
+# -----------------------------
+def _returned(command_name, reply):
+    """How many documents a reply carries."""
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or ())
+    if command_name == "findAndModify":
+        return 1 if reply.get("value") is not None else 0
+    return 0
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Counts and times commands, attributed to the current request's endpoint."""
+
+    # Handshakes and monitoring, not queries the app made
+    IGNORED = frozenset({"hello", "isMaster", "ismaster", "ping", "endSessions", "saslStart", "saslContinue"})
+
+    def __init__(self):
+        # request_id -> (collection, request stats) between started and succeeded/failed
+        self._pending = {}
+
+    def started(self, event):
+        if event.command_name in self.IGNORED:
+            return
+        target = event.command.get("collection" if event.command_name == "getMore" else event.command_name)
+        collection = target if isinstance(target, str) else "-"
+        self._pending[(event.connection_id, event.request_id)] = (collection, _current.get())
+
+    def _finish(self, event):
+        pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is None:
+            return None
+        collection, stats = pending
+        seconds = event.duration_micros / 1e6
+        endpoint = stats.endpoint if stats else BACKGROUND
+        MONGO_COMMANDS.labels(endpoint, collection, event.command_name).inc()
+        MONGO_SECONDS.labels(collection, event.command_name).observe(seconds)
+        if stats is not None:
+            with stats.lock:
+                stats.db_seconds += seconds
+                stats.db_commands += 1
+        return collection, endpoint
+
+    def succeeded(self, event):
+        finished = self._finish(event)
+        if finished:
+            returned = _returned(event.command_name, event.reply)
+            if returned:
+                MONGO_DOCUMENTS.labels(finished[1], finished[0]).inc(returned)
+
+    def failed(self, event):
+        finished = self._finish(event)
+        if finished:
+            MONGO_FAILURES.labels(finished[0], event.command_name).inc()
+
+
+command_metrics = CommandMetrics()
+
+
+# -----------------------------
+# Requests
+# -----------------------------
+def server_timing(stats, total):
+    """Server-Timing header value: MongoDB, JSON encoding, compression and the whole request, in ms."""
+    parts = [f'db;dur={stats.db_seconds * 1e3:.1f};desc="MongoDB, {stats.db_commands} commands"']
+    if stats.json_bytes:
+        parts.append(f'json;dur={stats.json_seconds * 1e3:.1f};desc="JSON, {stats.json_bytes} bytes"')
+    if stats.compress_seconds:
+        parts.append(f'compress;dur={stats.compress_seconds * 1e3:.1f}')
+    parts.append(f'total;dur={total * 1e3:.1f}')
+    return ", ".join(parts)
+
+
+def init_app(app):
+    """Register the /metrics route and the request hooks.
+
+    Call before responses.init_app: after_request hooks run in reverse
+    order, so ours then sees the compressed body and compression time.
+    """
+    if not app.config.get("METRICS", True):
+        return
+    app.register_blueprint(metrics_bp)
+
+    @app.before_request
+    def start_request_stats():
+        stats = RequestStats(request.endpoint or UNMATCHED)
+        g.request_stats_token = _current.set(stats)
+
+    @app.after_request
+    def record_request_stats(response):
+        stats = _current.get()
+        if stats is None:
+            return response
+        total = time.perf_counter() - stats.started
+        REQUEST_SECONDS.labels(stats.endpoint, request.method, response.status_code).observe(total)
+        if not response.direct_passthrough:
+            RESPONSE_BYTES.labels(stats.endpoint).observe(response.content_length or 0)
+        if stats.json_bytes:
+            SERIALIZED_BYTES.labels(stats.endpoint).inc(stats.json_bytes)
+            SERIALIZE_SECONDS.labels(stats.endpoint).inc(stats.json_seconds)
+        if app.config.get("SERVER_TIMING") or (app.config.get("SERVER_TIMING") is None and app.debug):
+            response.headers["Server-Timing"] = server_timing(stats, total)
+        return response
+
+    @app.teardown_request
+    def clear_request_stats(exc):
+        token = g.pop("request_stats_token", None)
+        if token is not None:
+            _current.reset(token)
+
+
+# -----------------------------
+# Scrape endpoint
+# -----------------------------
+@metrics_bp.route("/metrics")
+@limiter.exempt
+def scrape():
+    """Prometheus text format, summed over every gunicorn worker.
+
+    Needs METRICS_TOKEN as a bearer token; with no token set, only debug
+    mode serves it.
+    """
+    token = current_app.config.get("METRICS_TOKEN")
+    if not token and not current_app.debug:
+        return Response("Not Found\n", status=404, mimetype="text/plain")
+    if token and not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return Response("Unauthorized\n", status=401, mimetype="text/plain")
+
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    response = Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+    response.headers["Cache-Control"] = "no-store"
+    return response
@@ -0,0 +1,85 @@
+from urllib.parse import quote_plus
+
+from pymongo import MongoClient
+from pymongo.server_api import ServerApi
+
+from app.forksafe import PerProcess
+
+
+def mongo_uri(config):
+    """MONGO_URI if set, else the Atlas SRV URI built from MONGO_USER/PASSWORD/CLUSTER/DB."""
+    if config.get("MONGO_URI"):
+        return config["MONGO_URI"]
+    if not config.get("MONGO_PASSWORD"):
+        raise ValueError("MONGO_PASSWORD is missing in .env")
+    return (
+        f"mongodb+srv://{config['MONGO_USER']}:{quote_plus(config['MONGO_PASSWORD'])}"
+        f"@{config['MONGO_CLUSTER']}/{config['MONGO_DB']}?retryWrites=true&w=majority"
+    )
+
+
+def client_options(config):
+    """MongoClient keyword arguments from the MONGO_* settings in config.py."""
+    return {
+        "server_api": ServerApi("1"),
+        "appname": config["MONGO_APP_NAME"],
+        "maxPoolSize": config["MONGO_MAX_POOL_SIZE"],
+        "minPoolSize": config["MONGO_MIN_POOL_SIZE"],
+        "maxIdleTimeMS": config["MONGO_MAX_IDLE_TIME_MS"],
+        "waitQueueTimeoutMS": config["MONGO_WAIT_QUEUE_TIMEOUT_MS"],
+        "serverSelectionTimeoutMS": config["MONGO_SERVER_SELECTION_TIMEOUT_MS"],
+        "connectTimeoutMS": config["MONGO_CONNECT_TIMEOUT_MS"],
+        "compressors": config["MONGO_COMPRESSORS"],
+        "readConcernLevel": config["MONGO_READ_CONCERN"],
+    }
+
+
+class DatabaseProxy:
+    """Stands in for the app's pymongo ``Database``; ``from app import db`` imports this.
+
+    The MongoClient is built on first use in each process, not when the app
+    is created. A worker forked from a gunicorn ``--preload`` master never
+    touches the master's client (its pool and monitor threads aren't
+    fork-safe): it sees a new pid and connects on its own.
+    """
+
+    def __init__(self):
+        self._uri = None
+        self._name = None
+        self._options = {}
+        # (client, database) for this process
+        self._conn = PerProcess(self._connect)
+
+    def _connect(self):
+        if self._uri is None:
+            raise RuntimeError("Database used before create_app() configured it")
+        client = MongoClient(self._uri, **self._options)
+        return client, client.get_database(self._name)
+
+    def configure(self, uri, name, **options):
+        self._uri, self._name, self._options = uri, name, options
+        self._conn.reset()
+
+    def use(self, client):
+        """Serve this process from an existing client instead of connecting (scripts, benchmarks)."""
+        self._conn.set((client, client.get_database(self._name)))
+
+    @property
+    def client(self):
+        return self._conn.get()[0]
+
+    def get(self):
+        """The ``Database`` for this process, connecting on first use."""
+        return self._conn.get()[1]
+
+    def close(self):
+        """Close this process's client; the next use reconnects."""
+        if self._conn.built:
+            self._conn.get()[0].close()
+        self._conn.reset()
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+    def __getitem__(self, name):
+        return self.get()[name]
@@ -0,0 +1,379 @@
+"""Query-plan auditor: explain the queries routes actually issue and flag the scans.
+
+A pymongo CommandListener copies every find, aggregate, count, distinct,
+findAndModify, update and delete issued while capture is on. Each distinct
+query shape is then run through ``explain`` with ``executionStats``, and a
+plan is flagged when it examines more than ``ratio`` documents per
+document returned (and at least ``min_docs`` in all), or when it scans the
+whole collection. Each finding comes with the index that would serve it,
+built equality fields first, then the sort, then ranges, and says whether
+app/indexes.py already declares it.
+
+Two ways to run it:
+
+- ``flask db audit-queries`` sends a set of read-only requests through the
+  test client against the configured database, as one of its users, and
+  prints the findings (exit status 1 if any).
+- ``QUERY_AUDIT=1`` explains every new query shape after each request and
+  logs the findings. For development only: the explains cost a round
+  trip each.
+"""
+import contextvars
+import json
+import re
+from urllib.parse import urlencode
+
+from bson import ObjectId, Regex
+from flask import g, request
+from pymongo import monitoring
+from pymongo.errors import PyMongoError
+
+from app import db
+from app.indexes import INDEXES
+
+# Default thresholds (QUERY_AUDIT_RATIO / QUERY_AUDIT_MIN_DOCS)
+RATIO = 10
+MIN_DOCS = 100
+
+EXPLAINABLE = frozenset({"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"})
+# Command fields explain rejects or that only matter on the wire
+WIRE_FIELDS = frozenset({"lsid", "txnNumber", "readConcern", "writeConcern", "apiVersion", "apiStrict",
+                         "apiDeprecationErrors", "autocommit", "startTransaction"})
+RANGE_OPERATORS = frozenset({"$gt", "$gte", "$lt", "$lte", "$ne", "$nin", "$exists", "$type"})
+
+_captured = contextvars.ContextVar("captured_queries", default=None)
+
+
+# -----------------------------
+# Capture
+# -----------------------------
+class QueryCapture(monitoring.CommandListener):
+    """Copies explainable commands into the current capture list, if there is one."""
+
+    def started(self, event):
+        captured = _captured.get()
+        if captured is None or event.command_name not in EXPLAINABLE:
+            return
+        command = {k: v for k, v in event.command.items() if k not in WIRE_FIELDS and not k.startswith("$")}
+        captured.append((event.database_name, command))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+query_capture = QueryCapture()
+
+
+def start_capture():
+    """Collect this context's queries (and its fan-out's) until stop_capture(token)."""
+    return _captured.set([])
+
+
+def stop_capture(token):
+    captured = _captured.get()
+    _captured.reset(token)
+    return captured or []
+
+
+# -----------------------------
+# Query shapes
+# -----------------------------
+def _collection(command):
+    name = next(iter(command))
+    return command[name], name
+
+
+def _statement(command):
+    """The filter, sort and (for aggregate) first $match of a command."""
+    _, name = _collection(command)
+    if name == "aggregate":
+        pipeline = command.get("pipeline", [])
+        match = pipeline[0].get("$match", {}) if pipeline and "$match" in pipeline[0] else {}
+        sort = pipeline[1]["$sort"] if len(pipeline) > 1 and "$sort" in pipeline[1] else {}
+        return match, sort
+    if name in ("update", "delete"):
+        statement = (command.get("updates") or command.get("deletes") or [{}])[0]
+        return statement.get("q", {}), {}
+    return command.get("filter", command.get("query", {})) or {}, command.get("sort", {}) or {}
+
+
+def shape(value):
+    """``value`` with every literal replaced by its type, so queries differing only in values match."""
+    if isinstance(value, dict):
+        return {k: shape(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [shape(value[0])] if value else []
+    if isinstance(value, (Regex, re.Pattern)):
+        return "regex"
+    return type(value).__name__
+
+
+def _explainable(command):
+    """The command as explain takes it: updates and deletes with a single statement."""
+    _, name = _collection(command)
+    command = dict(command)
+    for key in ("updates", "deletes"):
+        if key in command:
+            command[key] = command[key][:1]
+    if name == "aggregate":
+        command.setdefault("cursor", {})
+    return command
+
+
+# -----------------------------
+# Index suggestions
+# -----------------------------
+def _regex_is_prefix(pattern, options=""):
+    return isinstance(pattern, str) and pattern.startswith("^") and "i" not in options
+
+
+def _classify(query, equality, ranges, notes):
+    for field, cond in query.items():
+        if field == "$and":
+            for clause in cond:
+                _classify(clause, equality, ranges, notes)
+        elif field in ("$or", "$nor"):
+            notes.append(f"{field} needs an index per branch; the suggestion covers the fields outside it")
+        elif field.startswith("$"):
+            notes.append(f"{field} can't use an index")
+        elif isinstance(cond, (Regex, re.Pattern)):
+            if _regex_is_prefix(cond.pattern, "i" if cond.flags & re.IGNORECASE else ""):
+                ranges.append(field)
+            else:
+                notes.append(f"{field}: an unanchored or case-insensitive regex scans every index key")
+        elif isinstance(cond, dict) and cond and all(k.startswith("$") for k in cond):
+            operators = set(cond)
+            if operators <= {"$eq", "$in"}:
+                equality.append(field)
+            elif "$regex" in operators:
+                if _regex_is_prefix(cond["$regex"], cond.get("$options", "")):
+                    ranges.append(field)
+                else:
+                    notes.append(f"{field}: an unanchored or case-insensitive regex scans every index key")
+            elif operators & {"$near", "$nearSphere", "$geoWithin", "$geoIntersects"}:
+                notes.append(f"{field}: geo queries need a 2dsphere index")
+            elif operators & RANGE_OPERATORS:
+                ranges.append(field)
+            else:
+                notes.append(f"{field}: {', '.join(sorted(operators))} can't use an index")
+        else:
+            equality.append(field)
+
+
+def suggest_index(query, sort):
+    """(index keys, notes) for a filter and sort: equality fields, then the sort, then ranges."""
+    equality, ranges, notes = [], [], []
+    _classify(query, equality, ranges, notes)
+    keys = [(field, 1) for field in dict.fromkeys(equality)]
+    keys += [(field, int(direction)) for field, direction in sort.items() if field not in equality]
+    keys += [(field, 1) for field in dict.fromkeys(ranges) if field not in dict(keys)]
+    return keys, notes
+
+
+def _covering(indexes, keys):
+    """Name of the first ``(name, key pattern)`` whose pattern starts with ``keys``, if any."""
+    for name, pattern in indexes:
+        pattern = [(field, d if isinstance(d, str) else int(d)) for field, d in pattern]
+        if keys and pattern[:len(keys)] == keys:
+            return name
+    return None
+
+
+def _declared_index(collection, keys):
+    return _covering(((m.document["name"], m.document["key"].items()) for m in INDEXES.get(collection, [])), keys)
+
+
+def _existing_index(database, collection, keys):
+    info = db.client[database][collection].index_information()
+    return _covering(((name, spec["key"]) for name, spec in info.items()), keys)
+
+
+# -----------------------------
+# Explain
+# -----------------------------
+def _walk(node, key):
+    """Every value stored under ``key`` anywhere in an explain document."""
+    if isinstance(node, dict):
+        for k, v in node.items():
+            if k == key:
+                yield v
+            yield from _walk(v, key)
+    elif isinstance(node, list):
+        for item in node:
+            yield from _walk(item, key)
+
+
+def _plan_stages(explain):
+    stages = set()
+    for plan in _walk(explain, "winningPlan"):
+        stages.update(s for s in _walk(plan, "stage") if isinstance(s, str))
+    return stages
+
+
+def analyze(explain):
+    """docs/keys examined, docs returned, ms and plan stages from an executionStats explain."""
+    stats = list(_walk(explain, "executionStats"))
+    examined = sum(s.get("totalDocsExamined", 0) for s in stats)
+    keys = sum(s.get("totalKeysExamined", 0) for s in stats)
+    millis = max((s.get("executionTimeMillis", 0) for s in stats), default=0)
+    returned = sum(s.get("nReturned", 0) for s in stats)
+    # An aggregation returns what its last stage emits, not what its cursor stage read
+    stages = explain.get("stages")
+    if isinstance(stages, list) and stages and "nReturned" in stages[-1]:
+        returned = stages[-1]["nReturned"]
+    return {"docs_examined": examined, "keys_examined": keys, "returned": returned,
+            "millis": millis, "stages": sorted(_plan_stages(explain))}
+
+
+def audit(captured, ratio=RATIO, min_docs=MIN_DOCS, seen=None, route=None):
+    """Explain each new query shape in ``captured``; returns a finding per shape.
+
+    ``seen`` (a set of shape keys) skips shapes already audited.
+    """
+    findings = []
+    for database, command in captured:
+        collection, name = _collection(command)
+        query, sort = _statement(command)
+        key = json.dumps([route, collection, name, shape(query), shape(sort)], sort_keys=True)
+        if seen is not None:
+            if key in seen:
+                continue
+            seen.add(key)
+        try:
+            explain = db.client[database].command({"explain": _explainable(command), "verbosity": "executionStats"})
+        except PyMongoError as e:
+            findings.append({"route": route, "collection": collection, "command": name,
+                             "filter": shape(query), "sort": shape(sort), "error": str(e), "flagged": False})
+            continue
+
+        result = analyze(explain)
+        scanned = result["docs_examined"] / max(result["returned"], 1)
+        collscan = "COLLSCAN" in result["stages"]
+        flagged = result["docs_examined"] >= min_docs and (scanned > ratio or collscan)
+        index, notes = suggest_index(query, sort)
+        existing = _existing_index(database, collection, index) if flagged and index else None
+        findings.append({
+            "route": route, "collection": collection, "command": name,
+            "filter": shape(query), "sort": shape(sort),
+            **result, "ratio": round(scanned, 1), "flagged": flagged,
+            "suggested_index": dict(index) if index else None,
+            "declared_as": _declared_index(collection, index),
+            "exists_as": existing,
+            "notes": notes,
+        })
+    return findings
+
+
+def describe(finding):
+    """Human-readable lines for one finding."""
+    head = f"{finding['route'] or '-'}: {finding['collection']}.{finding['command']}"
+    if "error" in finding:
+        return [f"ERROR {head}: {finding['error']}"]
+    lines = [
+        f"{'SCAN' if finding['flagged'] else 'ok  '} {head}  examined {finding['docs_examined']} docs / "
+        f"{finding['keys_examined']} keys for {finding['returned']} returned ({finding['ratio']}x), "
+        f"{finding['millis']} ms, {'+'.join(finding['stages'])}",
+        f"     filter {json.dumps(finding['filter'])} sort {json.dumps(finding['sort'])}",
+    ]
+    if finding["flagged"] and finding["suggested_index"]:
+        index = json.dumps(finding["suggested_index"])
+        if finding["exists_as"]:
+            lines.append(f"     index {index} already exists as {finding['exists_as']}: "
+                         "check which index the plan chose")
+        elif finding["declared_as"]:
+            lines.append(f"     index {index} is declared as {finding['declared_as']}: "
+                         "run `flask db ensure-indexes`")
+        else:
+            lines.append(f"     suggest db.{finding['collection']}.createIndex({index})")
+    for note in finding["notes"] if finding["flagged"] else ():
+        lines.append(f"     note: {note}")
+    return lines
+
+
+# -----------------------------
+# Routes the CLI drives
+# -----------------------------
+def audit_requests(university, event_id):
+    """Read-only requests covering the API's queries, for a user of ``university``."""
+    near = urlencode({"lat": university.get("latitude"), "lng": university.get("longitude")})
+    return [
+        "/auth/session",
+        "/api/universities/validate-domain?" + urlencode({"domain": university.get("domain", "")}),
+        "/api/universities/nearest?" + near,
+        "/api/universities/nearest_with_events?" + near,
+        "/api/events",
+        "/api/events?sort=latest",
+        "/api/events?" + urlencode({"campus": university["name"]}),
+        "/api/events?search=night",
+        "/api/events?is_custom=1",
+        "/api/events?is_custom=1&sort=latest",
+        "/api/events?hosted=1",
+        "/api/events?hosted=1&sort=latest",
+        f"/api/events/{event_id}",
+        "/api/user/optins",
+    ]
+
+
+def audit_routes(app, email=None, ratio=RATIO, min_docs=MIN_DOCS):
+    """Send audit_requests() through the test client and audit what they query."""
+    from app.auth import campus_context
+    from app.universities import universities
+
+    optins = db.user_optins.find_one({"email": email} if email else {"events.0": {"$exists": True}})
+    email = email or (optins["email"] if optins else None)
+    if not email:
+        raise ValueError("no user with reservations to audit as; pass one with --email")
+    university = universities.by_domain(email.split("@")[-1].lower())
+    if not university:
+        raise ValueError(f"{email} doesn't belong to a known university")
+    event = db.events.find_one({}, {"_id": 1}) or {"_id": ObjectId()}
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user"] = {"email": email, "name": "Query audit", "picture": "",
+                           "university": university["name"], **campus_context(university)}
+
+    findings, seen = [], set()
+    for path in audit_requests(university, event["_id"]):
+        token = start_capture()
+        try:
+            client.get(path)
+        finally:
+            captured = stop_capture(token)
+        findings += audit(captured, ratio, min_docs, seen, route=f"GET {path}")
+    return findings
+
+
+# -----------------------------
+# Dev middleware
+# -----------------------------
+def init_app(app):
+    """With QUERY_AUDIT set, explain each request's new query shapes and log the scans."""
+    if not app.config.get("QUERY_AUDIT"):
+        return
+    ratio = app.config.get("QUERY_AUDIT_RATIO", RATIO)
+    min_docs = app.config.get("QUERY_AUDIT_MIN_DOCS", MIN_DOCS)
+    seen = set()
+
+    @app.before_request
+    def capture_queries():
+        g.query_audit_token = start_capture()
+
+    @app.teardown_request
+    def audit_queries(exc):
+        token = g.pop("query_audit_token", None)
+        if token is None:
+            return
+        captured = stop_capture(token)
+        route = f"{request.method} {request.url_rule.rule if request.url_rule else request.path}"
+        try:
+            findings = audit(captured, ratio, min_docs, seen, route=route)
+        except PyMongoError as e:
+            app.logger.warning("Query audit failed for %s: %s", route, e)
+            return
+        for finding in findings:
+            if finding["flagged"] or "error" in finding:
+                app.logger.warning("Query audit\n%s", "\n".join(describe(finding)))
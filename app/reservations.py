@@ -0,0 +1,90 @@
+from pymongo.errors import DuplicateKeyError
+
+# Outcomes of reserve()
+RESERVED = "reserved"
+ALREADY_RESERVED = "already_reserved"
+SOLD_OUT = "sold_out"
+NOT_FOUND = "not_found"
+
+
+def has_seat_filter(event_id):
+    """Match the event only while it still has a free seat (or has no capacity set)."""
+    return {
+        "_id": event_id,
+        "$or": [
+            {"capacity": None},
+            {"$expr": {"$lt": [{"$ifNull": ["$tickets_sold", 0]}, "$capacity"]}},
+        ],
+    }
+
+
+def add_optin(db, event_id, email):
+    """Record the opt-in; False if the user already had it.
+
+    ``$addToSet`` makes repeat clicks from a user who already has an
+    opt-ins document no-ops. A user's *first* reservations are upserts,
+    and only the unique index on ``email`` (app/indexes.py) stops two
+    concurrent ones from inserting a document each: with it, the losing
+    upsert raises DuplicateKeyError and is retried as a plain update.
+    """
+    try:
+        result = db.user_optins.update_one({"email": email}, {"$addToSet": {"events": event_id}}, upsert=True)
+    except DuplicateKeyError:
+        result = db.user_optins.update_one({"email": email}, {"$addToSet": {"events": event_id}})
+    return bool(result.modified_count or result.upserted_id is not None)
+
+
+def drop_optin(db, event_id, email):
+    """Undo add_optin() for a reservation that didn't get a seat."""
+    db.user_optins.update_one({"email": email}, {"$pull": {"events": event_id}})
+
+
+def _reserve_buffered(db, event_id, email, counters):
+    """Uncapped events with the counter buffer on: the opt-in is the only synchronous write."""
+    if not add_optin(db, event_id, email):
+        return ALREADY_RESERVED
+    counters.incr(event_id)
+    return RESERVED
+
+
+def reserve(db, event_id, email, counters=None):
+    """Reserve one seat on ``event_id`` for ``email`` without a read-then-write race.
+
+    1. Record the opt-in with an ``$addToSet`` upsert. If the event was
+       already in the user's list nothing changes, and a double-click gets
+       ALREADY_RESERVED without ever touching the seat count.
+    2. Take a seat: a conditional ``$inc`` that only matches while
+       ``tickets_sold < capacity``, so concurrent requests can never oversell.
+       If there is none, the opt-in from step 1 is pulled again.
+
+    Only users who are new to the event take a seat, even for a moment, so
+    a double-click can't make the last seats look sold out to everyone
+    else. That's two round trips on success; a rejection costs one or two
+    more, to pull the opt-in and to tell a missing event from a full one.
+
+    With an enabled ``counters`` buffer (app/counters.py), events that have
+    no capacity skip step 2: the increment is buffered, so a hot event
+    costs one round trip per reservation.
+    """
+    if counters is not None and counters.enabled:
+        uncapped = counters.is_uncapped(event_id)
+        if uncapped is None:
+            return NOT_FOUND
+        if uncapped:
+            return _reserve_buffered(db, event_id, email, counters)
+
+    if not add_optin(db, event_id, email):
+        return ALREADY_RESERVED
+
+    try:
+        taken = db.events.update_one(has_seat_filter(event_id), {"$inc": {"tickets_sold": 1}})
+    except Exception:
+        drop_optin(db, event_id, email)
+        raise
+    if not taken.modified_count:
+        drop_optin(db, event_id, email)
+        if not db.events.count_documents({"_id": event_id}, limit=1):
+            return NOT_FOUND
+        return SOLD_OUT
+
+    return RESERVED
@@ -0,0 +1,134 @@
+import datetime
+import decimal
+import gzip
+import hashlib
+import json
+import time
+
+import orjson
+from bson import Decimal128, ObjectId
+from flask import request
+from flask.json.provider import JSONProvider
+
+from app.metrics import record_compression, record_serialization
+
+try:
+    import brotli
+except ImportError:  # optional: without it responses are gzip-only
+    brotli = None
+
+
+def body_etag(data):
+    """Strong validator for a response body."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _default(o):
+    """Types orjson doesn't encode natively. Decimals go out as strings, like Flask's default."""
+    if isinstance(o, (ObjectId, Decimal128, decimal.Decimal)):
+        return str(o)
+    if isinstance(o, (datetime.date, datetime.datetime)):
+        return o.isoformat()  # only reached on the stdlib fallback path
+    if hasattr(o, "__html__"):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def json_bytes(obj):
+    """Serialize ``obj`` to compact JSON bytes, with BSON types handled."""
+    return orjson.dumps(obj, default=_default)
+
+
+class FastJSONProvider(JSONProvider):
+    """orjson-backed JSON provider that stamps every ``jsonify`` response with an ETag.
+
+    ``datetime`` goes out as ISO 8601 and ``ObjectId``/``Decimal128`` as
+    strings, so serializers can hand BSON values straight through. The hash
+    is taken over the bytes as they come out of serialization, so computing
+    a validator never means serializing the payload a second time.
+
+    Calls that pass stdlib ``json`` options (Jinja's ``tojson`` does) fall
+    back to the stdlib encoder with the same type handling.
+    """
+
+    mimetype = "application/json"
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            kwargs.setdefault("default", _default)
+            return json.dumps(obj, **kwargs)
+        return json_bytes(obj).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return json.loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        option = orjson.OPT_INDENT_2 if self._app.debug else 0
+        t0 = time.perf_counter()
+        data = orjson.dumps(obj, default=_default, option=option | orjson.OPT_APPEND_NEWLINE)
+        record_serialization(time.perf_counter() - t0, len(data))
+        response = self._app.response_class(data, mimetype=self.mimetype)
+        response.set_etag(body_etag(data))
+        return response
+
+
+def _choose_encoding(min_bytes, response):
+    if response.direct_passthrough or response.status_code != 200:
+        return None
+    if "Content-Encoding" in response.headers or (response.content_length or 0) < min_bytes:
+        return None
+
+    accept = request.accept_encodings
+    if brotli is not None and accept.quality("br") > 0:
+        return "br"
+    if accept.quality("gzip") > 0:
+        return "gzip"
+    return None
+
+
+def _compress(app, data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=app.config["API_BROTLI_QUALITY"])
+    return gzip.compress(data, compresslevel=app.config["API_GZIP_LEVEL"], mtime=0)
+
+
+def init_app(app):
+    """Install the fast JSON provider, conditional GET and compression.
+
+    - ``If-None-Match`` against the body ETag answers 304 with no body.
+    - Bodies of ``API_COMPRESS_MIN_BYTES`` or more are sent brotli- or
+      gzip-encoded when the client accepts it. The encoded representation
+      gets its own ETag (``<etag>-br`` / ``<etag>-gzip``), as strong
+      validators must differ between encodings.
+    """
+    app.config.setdefault("API_COMPRESS_MIN_BYTES", 1024)
+    app.config.setdefault("API_GZIP_LEVEL", 6)
+    app.config.setdefault("API_BROTLI_QUALITY", 5)
+    app.json = FastJSONProvider(app)
+
+    @app.after_request
+    def conditional_and_compress(response):
+        if response.mimetype != "application/json":
+            return response
+
+        encoding = _choose_encoding(app.config["API_COMPRESS_MIN_BYTES"], response)
+        if encoding:
+            response.vary.add("Accept-Encoding")
+            etag, weak = response.get_etag()
+            if etag and not weak:
+                response.set_etag(f"{etag}-{encoding}")
+
+        if request.method in ("GET", "HEAD") and response.status_code == 200:
+            response.make_conditional(request)
+            if response.status_code == 304:
+                return response
+
+        if encoding:
+            t0 = time.perf_counter()
+            response.set_data(_compress(app, response.get_data(), encoding))
+            record_compression(time.perf_counter() - t0)
+            response.headers["Content-Encoding"] = encoding
+        return response
@@ -0,0 +1,482 @@
+import bisect
+import datetime
+import heapq
+import itertools
+import logging
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from operator import itemgetter
+
+from bson import ObjectId
+from pymongo.errors import PyMongoError
+from app import db
+from app.forksafe import PerProcess
+
+log = logging.getLogger(__name__)
+
+# Field weights for relevance: a hit in the title counts for more
+FIELD_WEIGHTS = {"title": 3.0, "description": 1.0}
+# Fields /events filters on, kept per document so a search can be scoped
+# to a campus, to custom locations or to a host before results are cut off
+SCOPE_FIELDS = ("location", "is_custom_location", "owner_email")
+
+# Score multipliers by how a query token matched an indexed term
+EXACT, PREFIX, FUZZY = 1.0, 0.7, 0.4
+
+MIN_PREFIX_LENGTH = 2
+MAX_PREFIX_EXPANSIONS = 50
+MIN_FUZZY_LENGTH = 4
+MIN_TRIGRAM_SIMILARITY = 0.3
+PULL_OVERLAP_SECONDS = 60
+# Tier combinations a multi-word search tries before checking whether it has
+# few enough matches to score them all instead
+MAX_TIER_COMBINATIONS = 4096
+
+_NONE = frozenset()
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """Lower-case, accent-folded word tokens."""
+    if not text:
+        return []
+    folded = unicodedata.normalize("NFKD", str(text).casefold())
+    folded = "".join(ch for ch in folded if not unicodedata.combining(ch))
+    return _WORD_RE.findall(folded)
+
+
+def trigrams(term):
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, limit):
+    """Levenshtein distance, giving up early (returning limit + 1) past ``limit``."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        if min(cur) > limit:
+            return limit + 1
+        prev = cur
+    return prev[-1]
+
+
+class _Index:
+    """Inverted index over event titles and descriptions.
+
+    Postings are impact-ordered: ``levels`` maps term -> {weight: set of doc
+    numbers}, where weight is the log-scaled weighted term frequency, so a
+    search takes equally scored documents a whole set at a time, best
+    first, instead of scoring each posting. Doc numbers are small ints
+    (cheaper to hash and compare than ObjectIds) mapped back through
+    ``event_ids``; an event keeps its doc number when it's re-indexed.
+    ``scopes`` maps (field, value) -> set of doc numbers for SCOPE_FIELDS,
+    intersected with those sets to scope a search before anything is
+    ranked. A sorted vocabulary serves prefix lookups for
+    search-as-you-type, and a trigram index over the vocabulary finds
+    near-miss spellings.
+
+    Once published, the sets in ``levels``, ``scopes`` and ``trigram_terms``
+    are replaced, never changed in place, so searches read them without a
+    lock while add/remove run. add/remove then only record their edits;
+    flush() applies them, copying each set once however many documents
+    changed it.
+    """
+
+    def __init__(self):
+        self.levels = {}
+        self.df = {}
+        self.event_ids = []
+        self.doc_numbers = {}
+        self.doc_terms = {}
+        self.doc_scopes = {}
+        self.scopes = {}
+        self.vocab = []
+        self.trigram_terms = {}
+        self.published = False
+        self._edits = []
+
+    def publish(self):
+        """Start copying sets on write; call before the index is shared."""
+        self.published = True
+
+    def _put(self, table, key, member):
+        if self.published:
+            self._edits.append((table, key, member, True))
+        else:
+            table.setdefault(key, set()).add(member)
+
+    def _drop(self, table, key, member):
+        if self.published:
+            self._edits.append((table, key, member, False))
+            return
+        members = table[key]
+        members.discard(member)
+        if not members:
+            del table[key]
+
+    def flush(self):
+        """Apply the edits made since the last flush, replacing each set they touch."""
+        edits, self._edits = self._edits, []
+        copies = {}
+        for table, key, member, added in edits:
+            slot = (id(table), key)
+            if slot not in copies:
+                copies[slot] = (table, key, set(table.get(key, ())))
+            members = copies[slot][2]
+            if added:
+                members.add(member)
+            else:
+                members.discard(member)
+        for table, key, members in copies.values():
+            if members:
+                table[key] = members
+            else:
+                table.pop(key, None)
+
+    def add(self, event_id, doc):
+        weights = Counter()
+        for field, weight in FIELD_WEIGHTS.items():
+            for term in tokenize(doc.get(field)):
+                weights[term] += weight
+        terms = {term: 1 + math.log(weight) for term, weight in weights.items()}
+        scope = tuple((field, doc.get(field)) for field in SCOPE_FIELDS)
+
+        doc_no = self.doc_numbers.get(event_id)
+        if doc_no is None:
+            doc_no = len(self.event_ids)
+            self.event_ids.append(event_id)
+            self.doc_numbers[event_id] = doc_no
+        self._update(doc_no, terms, scope)
+
+    def remove(self, event_id):
+        doc_no = self.doc_numbers.pop(event_id, None)
+        if doc_no is None:
+            return
+        self.event_ids[doc_no] = None
+        self._update(doc_no, {}, ())
+
+    def _update(self, doc_no, terms, scope):
+        """Re-index one document, touching only the terms and scope values that changed."""
+        old_terms = self.doc_terms.pop(doc_no, {})
+        old_scope = self.doc_scopes.pop(doc_no, ())
+        if scope:  # removing passes none
+            self.doc_terms[doc_no] = terms
+            self.doc_scopes[doc_no] = scope
+
+        for key in set(old_scope) - set(scope):
+            self._drop(self.scopes, key, doc_no)
+        for key in set(scope) - set(old_scope):
+            self._put(self.scopes, key, doc_no)
+
+        for term, weight in old_terms.items():
+            if terms.get(term) == weight:
+                continue
+            self._drop(self.levels[term], weight, doc_no)
+            if term in terms:
+                continue
+            self.df[term] -= 1
+            if not self.df[term]:
+                del self.levels[term], self.df[term]
+                self.vocab.pop(bisect.bisect_left(self.vocab, term))
+                for gram in trigrams(term):
+                    self._drop(self.trigram_terms, gram, term)
+        for term, weight in terms.items():
+            if old_terms.get(term) == weight:
+                continue
+            if term not in self.levels:
+                self.levels[term] = {}
+                self.df[term] = 0
+                bisect.insort(self.vocab, term)
+                for gram in trigrams(term):
+                    self._put(self.trigram_terms, gram, term)
+            self._put(self.levels[term], weight, doc_no)
+            if term not in old_terms:
+                self.df[term] += 1
+
+    def _expand(self, token, is_last):
+        """Indexed terms a query token may stand for, with their match quality."""
+        matches = {}
+        if token in self.levels:
+            matches[token] = EXACT
+
+        # Search-as-you-type: the last token is usually still being typed
+        if is_last and len(token) >= MIN_PREFIX_LENGTH:
+            start = bisect.bisect_left(self.vocab, token)
+            prefixed = []
+            for term in itertools.islice(self.vocab, start, None):
+                if not term.startswith(token):
+                    break
+                if term != token:
+                    prefixed.append(term)
+            prefixed.sort(key=lambda t: self.df.get(t, 0), reverse=True)
+            for term in prefixed[:MAX_PREFIX_EXPANSIONS]:
+                matches[term] = PREFIX
+
+        if not matches and len(token) >= MIN_FUZZY_LENGTH:
+            grams = trigrams(token)
+            overlap = Counter(term for gram in grams for term in self.trigram_terms.get(gram, ()))
+            limit = 1 if len(token) <= 5 else 2
+            for term, shared in overlap.items():
+                similarity = shared / len(grams | trigrams(term))
+                if similarity >= MIN_TRIGRAM_SIMILARITY and edit_distance(token, term, limit) <= limit:
+                    matches[term] = FUZZY
+
+        return matches
+
+    def _tiers(self, token, is_last, total):
+        """[(score, doc numbers)] for one query token, best first.
+
+        A document matching several of the token's terms is in several
+        tiers; the first one it's found in is its best.
+        """
+        tiers = []
+        for term, quality in self._expand(token, is_last).items():
+            levels = self.levels.get(term)
+            if levels:
+                boost = quality * math.log(1 + total / max(self.df.get(term, 0), 1))
+                tiers.extend((boost * weight, docs) for weight, docs in list(levels.items()))
+        tiers.sort(key=itemgetter(0), reverse=True)
+        return tiers
+
+    def search(self, query, limit, scope=None):
+        tokens = list(dict.fromkeys(tokenize(query)))
+        # Search-as-you-type: a last word too short to expand is still being typed
+        if len(tokens) > 1 and len(tokens[-1]) < MIN_PREFIX_LENGTH and tokens[-1] not in self.levels:
+            tokens.pop()
+        if not tokens:
+            return []
+
+        allowed = None
+        if scope:
+            sets = [self.scopes.get(item, _NONE) for item in scope.items()]
+            allowed = sets[0] if len(sets) == 1 else min(sets, key=len).intersection(*sets)
+            if not allowed:
+                return []
+
+        total = max(len(self.doc_terms), 1)
+        ranked = []
+        for pos, token in enumerate(tokens):
+            # Every query token has to match something
+            tiers = self._tiers(token, pos == len(tokens) - 1, total)
+            if not tiers:
+                return []
+            ranked.append(tiers)
+
+        matched = None
+
+        def few_matches():
+            # Few matches spread over many tiers are quicker found all at once
+            nonlocal matched
+            matched = self._matching(ranked, allowed)
+            return len(matched) <= limit
+
+        best = self._best(ranked, limit, allowed, few_matches if len(ranked) > 1 else None)
+        if best is None:
+            best = self._score_all(ranked, matched)
+        # A document removed but not yet flushed has no event id any more
+        event_ids = self.event_ids
+        return [event_ids[n] for n in best if event_ids[n] is not None]
+
+    @staticmethod
+    def _matching(ranked, allowed):
+        """Every doc number matching all tokens, narrowing from the rarest one."""
+        matched = allowed
+        for tiers in sorted(ranked, key=lambda tiers: sum(len(docs) for _, docs in tiers)):
+            if matched is None:
+                matched = set().union(*(docs for _, docs in tiers))
+            else:
+                matched = set().union(*(docs & matched for _, docs in tiers))
+        return matched
+
+    @staticmethod
+    def _score_all(ranked, matched):
+        """All of ``matched``, ranked; for result sets no larger than the limit."""
+        scores = dict.fromkeys(matched, 0.0)
+        for tiers in ranked:
+            token_scores = {}
+            for score, docs in reversed(tiers):
+                token_scores.update(dict.fromkeys(docs & matched, score))  # the best tier wins
+            for doc_no, score in token_scores.items():
+                scores[doc_no] += score
+        # Best score first; ties go to the most recently indexed event
+        return sorted(matched, key=lambda n: (scores[n], n), reverse=True)
+
+    @staticmethod
+    def _best(ranked, limit, allowed=None, give_up=None):
+        """The ``limit`` best doc numbers by the sum of each token's best tier score.
+
+        Combinations of one tier per token are visited best sum first, so
+        only as many intersections are computed as it takes to fill
+        ``limit``, and a one-word query just walks its tiers. After
+        MAX_TIER_COMBINATIONS, returns None if ``give_up()`` is true.
+        """
+        def total(combo):
+            return sum(tiers[i][0] for tiers, i in zip(ranked, combo))
+
+        # Intersections for the first tokens' tiers, shared by every combination extending them
+        prefixes = {}
+
+        def matching(combo):
+            docs = None
+            for depth in range(1, len(combo) + 1):
+                key = combo[:depth]
+                cached = prefixes.get(key)
+                if cached is None:
+                    tier = ranked[depth - 1][combo[depth - 1]][1]
+                    if docs is None:
+                        cached = tier & allowed if allowed is not None else tier
+                    else:
+                        cached = docs & tier
+                    if depth < len(combo):
+                        prefixes[key] = cached
+                docs = cached
+                if not docs:
+                    break
+            return docs
+
+        first = (0,) * len(ranked)
+        heap = [(-total(first), first)]
+        visited = {first}
+        results, found, taken = [], 0, set()
+        while heap:
+            neg_score, combo = heapq.heappop(heap)
+            if found >= limit and -neg_score < results[-1][0]:
+                break
+            if give_up is not None and len(visited) > MAX_TIER_COMBINATIONS:
+                if give_up():
+                    return None
+                give_up = None
+            docs = matching(combo)
+            if docs and taken:
+                docs = docs - taken
+            if docs:
+                results.append((-neg_score, docs))
+                found += len(docs)
+                taken |= docs
+            for d, i in enumerate(combo):
+                if i + 1 < len(ranked[d]):
+                    after = combo[:d] + (i + 1,) + combo[d + 1:]
+                    if after not in visited:
+                        visited.add(after)
+                        heapq.heappush(heap, (-total(after), after))
+
+        # Best score first; ties go to the most recently indexed event
+        best = []
+        for _, tied in itertools.groupby(results, key=itemgetter(0)):
+            best.extend(sorted(set().union(*(docs for _, docs in tied)), reverse=True))
+            if len(best) >= limit:
+                break
+        return best[:limit]
+
+
+class EventSearchIndex:
+    """Process-local full-text search over ``events``.
+
+    Built from the collection on first use, updated in place by
+    ``add``/``remove`` on this worker's writes, and kept in step with other
+    workers by a background thread: a change stream where available, else
+    polling for events inserted since the newest one indexed.
+    """
+
+    def __init__(self, refresh_seconds=5):
+        self.refresh_seconds = refresh_seconds
+        self._index = None
+        self._loaded = PerProcess(self._build)
+        self._last_id = None
+        self._lock = threading.RLock()
+
+    def _build(self):
+        # Each worker builds its own index and starts its own watcher
+        with self._lock:
+            self._index = _Index()
+            self._last_id = None
+            self._pull()
+            self._index.publish()
+        threading.Thread(target=self._watch, name="event-search", daemon=True).start()
+
+    def _ensure_loaded(self):
+        self._loaded.get()
+        return self._index
+
+    def _pull(self):
+        query = {}
+        if self._last_id:
+            # ObjectIds from different workers only order by the second, so
+            # re-read a short overlap; re-adding an event is idempotent
+            since = self._last_id.generation_time - datetime.timedelta(seconds=PULL_OVERLAP_SECONDS)
+            query = {"_id": {"$gt": ObjectId.from_datetime(since)}}
+        try:
+            for doc in db.events.find(query, {field: 1 for field in (*FIELD_WEIGHTS, *SCOPE_FIELDS)}).sort("_id", 1):
+                self._index.add(doc["_id"], doc)
+                self._last_id = max(self._last_id or doc["_id"], doc["_id"])
+        finally:
+            self._index.flush()
+
+    def _watch(self):
+        try:
+            with db.events.watch(full_document="updateLookup") as stream:
+                for change in stream:
+                    event_id = change["documentKey"]["_id"]
+                    with self._lock:
+                        if change["operationType"] == "delete" or not change.get("fullDocument"):
+                            self._index.remove(event_id)
+                        else:
+                            self._index.add(event_id, change["fullDocument"])
+                        self._index.flush()
+        except PyMongoError:
+            pass  # standalone mongod, or the stream died: poll from here on
+        except Exception:
+            log.exception("Event search change stream failed; polling instead")
+
+        while True:
+            time.sleep(self.refresh_seconds)
+            try:
+                with self._lock:
+                    self._pull()
+            except PyMongoError:
+                pass
+            except Exception:
+                log.exception("Event search refresh failed")
+
+    def warm(self):
+        """Build this process's index now rather than on the first search."""
+        self._ensure_loaded()
+
+    def add(self, event):
+        """Index (or re-index) one event document."""
+        index = self._ensure_loaded()
+        with self._lock:
+            index.add(event["_id"], event)
+            index.flush()
+
+    def remove(self, *event_ids):
+        """Drop events from the index; pass a batch at once to copy each changed set only once."""
+        index = self._ensure_loaded()
+        with self._lock:
+            for event_id in event_ids:
+                index.remove(event_id)
+            index.flush()
+
+    def search(self, query, limit=1000, scope=None):
+        """Event ids matching every word of ``query``, most relevant first.
+
+        The last word also matches as a prefix, and words of four or more
+        letters with no exact match fall back to terms within one or two
+        edits. ``scope`` ({field: value} over SCOPE_FIELDS) keeps only
+        events with those values, before ``limit`` is applied. Runs
+        without the lock: see _Index.
+        """
+        return self._ensure_loaded().search(query, limit, scope)
+
+
+event_search = EventSearchIndex()
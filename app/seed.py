@@ -0,0 +1,316 @@
+"""Generated data for development, staging and the benchmarks.
+
+Documents have the shapes the app itself writes (api.create_event,
+auth.callback, app/reservations.py): an event's ``location`` is its
+campus's university name, and its tickets_sold equals the opt-ins that
+reference it. Everything derives from one seed, in fixed chunks of CHUNK
+documents, so any range can be rebuilt on its own, in any process, and two
+loads with the same seed and sizes are identical whatever the batch size
+or worker count.
+
+    flask db seed --events 1000000 --universities 5000 --users 100000
+
+or from Python:
+
+    Dataset(events=100_000, universities=5_000, users=100_000).load(db)
+"""
+import datetime
+import itertools
+import multiprocessing
+import random
+import time
+
+import numpy as np
+from bson import ObjectId
+
+from app.indexes import ensure_indexes
+from app.mongo import DatabaseProxy
+
+SCALES = {
+    "small": {"universities": 20, "events": 1_000, "users": 1_000},
+    "medium": {"universities": 5_000, "events": 100_000, "users": 100_000},
+    "large": {"universities": 5_000, "events": 1_000_000, "users": 100_000},
+}
+
+# Documents generated from one RNG seed
+CHUNK = 1_000
+
+# The campuses we launched with, so small datasets look like production
+CAMPUSES = [
+    ("University of Nairobi (Main Campus)", "uonbi.ac.ke", -1.280971, 36.8135383, "Public"),
+    ("Kenyatta University (Main Campus)", "ku.ac.ke", -1.1820777, 36.9341004, "Public"),
+    ("Technical University of Kenya (TUK)", "tukenya.ac.ke", -1.2912589, 36.8227188, "Public"),
+    ("JKUAT Juja (Main Campus)", "jkuat.ac.ke", -1.0913809, 36.9936649, "Public"),
+    ("Multimedia University of Kenya", "mmu.ac.ke", -1.3819407, 36.7656496, "Public"),
+    ("Co-operative University of Kenya (Karen)", "cuk.ac.ke", -1.3665655, 36.7266569, "Public"),
+    ("Kirinyaga University", "kyu.ac.ke", -0.6956697, 35.9761505, "Public"),
+    ("Machakos University", "mksu.ac.ke", -1.5308534, 37.2601941, "Public"),
+    ("South Eastern Kenya University", "seku.ac.ke", -1.37798, 37.7178789, "Public"),
+    ("Maasai Mara University", "mmarau.ac.ke", -1.0943661, 35.8580261, "Public"),
+    ("Strathmore University", "strathmore.edu", -1.3089602, 36.8075432, "Private"),
+    ("USIU-Africa", "usiu.ac.ke", -1.2211537, 36.880816, "Private"),
+    ("Catholic University of Eastern Africa (CUEA)", "cuea.edu", -1.3559738, 36.7119972, "Private"),
+    ("Daystar University (Valley Road)", "daystar.ac.ke", -1.2975367, 36.7976492, "Private"),
+    ("Africa Nazarene University (Nairobi CBD)", "anu.ac.ke", -1.3997791, 36.706351, "Private"),
+    ("KCA University", "kcau.ac.ke", -1.2672544, 36.8183049, "Private"),
+    ("St. Paul’s University (Limuru Campus)", "spu.ac.ke", -1.1475883, 36.6632489, "Private"),
+    ("Mount Kenya University (Juja Campus)", "mku.ac.ke", -1.0448217, 36.7932304, "Private"),
+    ("Riara University", "riarauniversity.ac.ke", -1.3148565, 36.8043483, "Private"),
+    ("Africa International University (Karen)", "aiu.ac.ke", -1.30678, 36.6830321, "Private"),
+]
+
+TOWNS = ["Nairobi", "Mombasa", "Kisumu", "Nakuru", "Eldoret", "Thika", "Nyeri", "Meru", "Kampala",
+         "Arusha", "Dodoma", "Kigali", "Mwanza", "Jinja", "Gulu", "Moshi", "Kakamega", "Machakos"]
+VENUES = ["KICC Grounds", "Carnivore Grounds", "Ngong Racecourse", "Uhuru Gardens", "The Alchemist",
+          "Sarit Expo Centre", "Two Rivers Mall", "Kasarani Stadium", "Nyayo Stadium", "The Hub Karen"]
+
+TITLE_WORDS = ["hackathon", "career", "fair", "gala", "concert", "football", "derby", "workshop",
+               "bootcamp", "movie", "night", "cultural", "festival", "debate", "startup", "pitch",
+               "charity", "run", "karaoke", "poetry", "open", "mic", "fashion", "show", "comedy",
+               "worship", "tech", "talk", "art", "exhibition", "freshers", "bash", "chess", "tournament"]
+SENTENCE_WORDS = TITLE_WORDS + ["students", "campus", "tickets", "free", "entry", "music", "food",
+                                "prizes", "speakers", "register", "early", "limited", "seats", "join",
+                                "us", "for", "the", "best", "evening", "of", "the", "semester"]
+PRICES = [100, 200, 250, 300, 500, 750, 1000, 1500, 2000]
+DAY = datetime.timedelta(days=1)
+
+
+def object_id(timestamp, index):
+    """A deterministic ObjectId: a creation time plus a running number."""
+    return ObjectId(f"{int(timestamp.timestamp()) & 0xFFFFFFFF:08x}{index:016x}")
+
+
+class Dataset:
+    """Universities, users with opt-ins, and events, generated from one seed.
+
+    Event popularity across campuses is skewed (a few big campuses hold
+    most events), about one event in seven is at a custom venue, and
+    start times span the past three months to four months ahead.
+    Universities are built up front; users, opt-ins and events a range
+    at a time.
+    """
+
+    def __init__(self, events, universities, users, seed=42, optins_per_user=6, now=None):
+        self.event_count = events
+        self.university_count = universities
+        self.user_count = users
+        self.seed = seed
+        self.optins_per_user = optins_per_user
+        self.now = now or datetime.datetime.utcnow().replace(microsecond=0)
+        self.universities = self._universities()
+        # Most students are at the first few campuses
+        rng = np.random.default_rng(seed)
+        self._user_university = np.minimum(rng.pareto(1.2, users).astype(np.int64), max(universities - 1, 0))
+        # Zipf-ish weights: campus k gets 1/k of the first campus's events
+        self._campus_weights = list(itertools.accumulate(1 / (k + 1) for k in range(universities)))
+        # Opt-ins per event, counted by load()
+        self.tickets_sold = None
+
+    @classmethod
+    def scale(cls, name, **kwargs):
+        return cls(**{**SCALES[name], **kwargs})
+
+    def event_id(self, index):
+        return object_id(self.now, index)
+
+    def _chunks(self, kind, start, stop, make):
+        """make(index, rng) for start..stop, each chunk from its own seeded RNG."""
+        docs = []
+        for chunk in range(start // CHUNK, -(-stop // CHUNK)):
+            rng = random.Random(f"{self.seed}:{kind}:{chunk}")
+            for index in range(chunk * CHUNK, min((chunk + 1) * CHUNK, stop)):
+                doc = make(index, rng)
+                if index >= start and doc is not None:
+                    docs.append(doc)
+        return docs
+
+    # -----------------------------
+    # Documents
+    # -----------------------------
+    def _universities(self):
+        rng = random.Random(f"{self.seed}:universities")
+        docs = []
+        for i in range(self.university_count):
+            if i < len(CAMPUSES):
+                name, domain, lat, lng, kind = CAMPUSES[i]
+            else:
+                town = rng.choice(TOWNS)
+                name = f"{town} University College {i}"
+                domain = f"u{i}.ac.ke"
+                # Across East Africa, roughly
+                lat, lng, kind = rng.uniform(-6, 3), rng.uniform(29.5, 41), rng.choice(["Public", "Private"])
+            docs.append({"_id": object_id(self.now - 365 * DAY, i), "name": name, "domain": domain,
+                         "latitude": lat, "longitude": lng, "type": kind})
+        return docs
+
+    def user_email(self, index):
+        return f"student{index}@{self.universities[self._user_university[index]]['domain']}"
+
+    def user(self, index):
+        """User ``index`` as auth.callback stores it."""
+        university = self.universities[self._user_university[index]]
+        return {
+            "email": self.user_email(index),
+            "name": f"Student {index}",
+            "university_id": str(university["_id"]),
+            "university_name": university["name"],
+            "created_at": self.now - (index * 7919 % 720) * DAY,
+        }
+
+    def users(self, start, stop):
+        return [self.user(i) for i in range(start, stop)]
+
+    def _optin(self, index, rng):
+        # Most students reserve a handful of events; some never do
+        count = min(int(rng.expovariate(1 / self.optins_per_user)), self.event_count)
+        if not count:
+            return None
+        return {"email": self.user_email(index), "events": rng.sample(range(self.event_count), count)}
+
+    def optin_indexes(self, start, stop):
+        """user_optins documents for users start..stop, with event indexes rather than ids."""
+        return self._chunks("optins", start, stop, self._optin) if self.event_count else []
+
+    def optins(self, docs):
+        """The user_optins documents for optin_indexes() output."""
+        return [{"email": doc["email"], "events": [self.event_id(i) for i in doc["events"]]} for doc in docs]
+
+    def _event(self, index, rng, sold):
+        custom = rng.random() < 0.15
+        if custom:
+            location = f"{rng.choice(VENUES)}, {rng.choice(TOWNS)}"
+        else:
+            location = rng.choices(self.universities, cum_weights=self._campus_weights)[0]["name"]
+        start = self.now + datetime.timedelta(minutes=rng.randint(-90 * 24 * 60, 120 * 24 * 60))
+        created = min(start - rng.randint(1, 60) * DAY, self.now)
+        is_free = rng.random() < 0.4
+        price = 0.0 if is_free else float(rng.choice(PRICES))
+        capacity = None if rng.random() < 0.5 else max(sold, rng.choice([30, 50, 100, 200, 500, 2000]))
+        owner = self.user_email(rng.randrange(self.user_count)) if self.user_count else "host@bench.test"
+        words = rng.sample(TITLE_WORDS, rng.randint(2, 4))
+        sentences = [" ".join(rng.choices(SENTENCE_WORDS, k=rng.randint(6, 18))).capitalize() + "."
+                     for _ in range(rng.randint(1, 12))]
+        return {
+            "_id": self.event_id(index),
+            "title": " ".join(words).title(),
+            "description": " ".join(sentences),
+            "image_url": f"https://picsum.photos/400/250?random={index}",
+            "location": location,
+            "open_to": "everyone",
+            "start_time": start,
+            "end_time": start + datetime.timedelta(hours=rng.randint(1, 12)),
+            "ticket_price": price,
+            "is_free": is_free,
+            "tickets_sold": sold,
+            "capacity": capacity,
+            "is_custom_location": custom,
+            "service_fee": max(50.0, round(price * 0.10, 2)) if custom else 0.0,
+            "created_at": created,
+            "created_by": owner,
+            "owner_email": owner,
+        }
+
+    def events(self, start, stop, sold=None):
+        """Events start..stop. ``sold`` is their tickets_sold, defaulting to self.tickets_sold."""
+        if sold is None:
+            sold = self.tickets_sold[start:stop] if self.tickets_sold is not None else np.zeros(stop - start)
+        return self._chunks("events", start, stop, lambda i, rng: self._event(i, rng, int(sold[i - start])))
+
+    # -----------------------------
+    # Loading
+    # -----------------------------
+    def load(self, db, batch_size=5_000, workers=1, report=None):
+        """Insert everything into ``db``, whose collections should be empty, then create the indexes.
+
+        With workers > 1 batches are generated and inserted by that many
+        forked processes, so ``db`` must reconnect after a fork, as the
+        app's ``db`` does. ``report(collection, docs, seconds)`` is called
+        as each collection finishes, and with docs None once the indexes are
+        built. Returns the total documents inserted.
+        """
+        batch_size = max(CHUNK, batch_size // CHUNK * CHUNK)
+        report = report or (lambda collection, docs, seconds: None)
+        total = 0
+
+        t0 = time.perf_counter()
+        if self.universities:
+            db.universities.insert_many(self.universities, ordered=False)
+        report("universities", len(self.universities), time.perf_counter() - t0)
+        total += len(self.universities)
+
+        pool = None
+        if workers > 1:
+            if not isinstance(db, DatabaseProxy):
+                raise ValueError("loading with workers needs the app's db, which reconnects after fork")
+            db.close()  # the workers connect on their own
+            pool = multiprocessing.get_context("fork").Pool(workers, _init_worker, (self, db))
+            run = pool.imap_unordered
+        else:
+            _init_worker(self, db)
+            run = map
+        try:
+            t0 = time.perf_counter()
+            users = optins = 0
+            self.tickets_sold = np.zeros(self.event_count, dtype=np.int64)
+            ranges = [(s, min(s + batch_size, self.user_count)) for s in range(0, self.user_count, batch_size)]
+            for inserted_users, inserted_optins, reserved in run(_insert_users, ranges):
+                users += inserted_users
+                optins += inserted_optins
+                np.add.at(self.tickets_sold, reserved, 1)
+            report("users + user_optins", users + optins, time.perf_counter() - t0)
+            total += users + optins
+
+            t0 = time.perf_counter()
+            events = 0
+            ranges = [(s, min(s + batch_size, self.event_count), self.tickets_sold[s:s + batch_size])
+                      for s in range(0, self.event_count, batch_size)]
+            for inserted in run(_insert_events, ranges):
+                events += inserted
+            report("events", events, time.perf_counter() - t0)
+            total += events
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+
+        t0 = time.perf_counter()
+        ensure_indexes(db)
+        report("indexes", None, time.perf_counter() - t0)
+        return total
+
+    def is_loaded(self, db):
+        """Whether ``db`` already holds a dataset of this size."""
+        return (db.events.estimated_document_count() == self.event_count
+                and db.universities.estimated_document_count() == self.university_count
+                and db.users.estimated_document_count() == self.user_count)
+
+
+# -----------------------------
+# Pool workers
+# -----------------------------
+# Set in each worker (or in this process when loading without a pool)
+_dataset = None
+_db = None
+
+
+def _init_worker(dataset, db):
+    global _dataset, _db
+    _dataset, _db = dataset, db
+
+
+def _insert_users(bounds):
+    start, stop = bounds
+    _db.users.insert_many(_dataset.users(start, stop), ordered=False)
+    docs = _dataset.optin_indexes(start, stop)
+    reserved = np.fromiter((i for doc in docs for i in doc["events"]), dtype=np.int64)
+    if docs:
+        _db.user_optins.insert_many(_dataset.optins(docs), ordered=False)
+    return stop - start, len(docs), reserved
+
+
+def _insert_events(task):
+    start, stop, sold = task
+    docs = _dataset.events(start, stop, sold)
+    if docs:
+        _db.events.insert_many(docs, ordered=False)
+    return len(docs)
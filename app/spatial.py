@@ -0,0 +1,120 @@
+import heapq
+import math
+from collections import defaultdict
+
+EARTH_RADIUS_KM = 6371
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Calculate distance between two lat/lng points in km."""
+    R = EARTH_RADIUS_KM
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat/2)**2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon/2)**2
+    return R * (2 * math.atan2(math.sqrt(a), math.sqrt(1 - a)))
+
+
+class UniversityGrid:
+    """Immutable lat/lng grid over a snapshot of university documents.
+
+    Queries walk square rings of cells outwards from the query point and stop
+    once no unvisited cell can hold anything closer than what was already
+    found, so distances are exact and ties resolve in collection order, just
+    like a full scan would.
+    """
+
+    def __init__(self, docs, cell_deg=1.0):
+        self.docs = docs
+        self.cell_deg = cell_deg
+        self.cells = defaultdict(list)
+        for idx, doc in enumerate(docs):
+            self.cells[self._cell(doc["latitude"], doc["longitude"])].append(idx)
+
+        if docs:
+            lats = [d["latitude"] for d in docs]
+            lngs = [d["longitude"] for d in docs]
+            self.max_abs_lat = max(abs(v) for v in lats)
+            self.min_lng, self.max_lng = min(lngs), max(lngs)
+            rows = [i for i, _ in self.cells]
+            cols = [j for _, j in self.cells]
+            self.extent = (min(rows), max(rows), min(cols), max(cols))
+
+    def _cell(self, lat, lng):
+        return math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg)
+
+    def _ring(self, ci, cj, r):
+        if r == 0:
+            yield ci, cj
+            return
+        for j in range(cj - r, cj + r + 1):
+            yield ci - r, j
+            yield ci + r, j
+        for i in range(ci - r + 1, ci + r):
+            yield i, cj - r
+            yield i, cj + r
+
+    def _lower_bound(self, r, cos_max):
+        """Smallest possible distance (km) to any point outside rings 0..r."""
+        deg = r * self.cell_deg
+        by_lat = EARTH_RADIUS_KM * math.radians(deg)
+        half_lng = min(math.radians(deg), math.pi) / 2
+        by_lng = 2 * EARTH_RADIUS_KM * math.asin(min(1.0, cos_max * math.sin(half_lng)))
+        return min(by_lat, by_lng)
+
+    def _candidates(self, lat, lng):
+        """Yield ``(indices, bound)`` per ring, nearest first.
+
+        ``bound`` is the smallest distance anything in a later ring can have.
+        """
+        # The grid doesn't wrap the antimeridian; fall back to one big "ring"
+        if abs(lng - self.min_lng) > 180 or abs(lng - self.max_lng) > 180:
+            yield range(len(self.docs)), math.inf
+            return
+
+        ci, cj = self._cell(lat, lng)
+        imin, imax, jmin, jmax = self.extent
+        max_r = max(abs(ci - imin), abs(ci - imax), abs(cj - jmin), abs(cj - jmax))
+        cos_max = math.cos(math.radians(max(self.max_abs_lat, abs(lat))))
+
+        for r in range(max_r + 1):
+            indices = [idx for cell in self._ring(ci, cj, r) for idx in self.cells.get(cell, ())]
+            bound = math.inf if r == max_r else self._lower_bound(r, cos_max)
+            yield indices, bound
+
+    def _distance(self, lat, lng, idx):
+        doc = self.docs[idx]
+        return haversine(lat, lng, doc["latitude"], doc["longitude"])
+
+    def nearest(self, lat, lng, k):
+        if not self.docs or k <= 0:
+            return []
+        k = min(k, len(self.docs))
+
+        # Max-heap of the best k as (-distance, -index)
+        heap = []
+        for indices, bound in self._candidates(lat, lng):
+            for idx in indices:
+                item = (-self._distance(lat, lng, idx), -idx)
+                if len(heap) < k:
+                    heapq.heappush(heap, item)
+                elif item > heap[0]:
+                    heapq.heapreplace(heap, item)
+            if len(heap) == k and bound > -heap[0][0]:
+                break
+
+        return [(self.docs[idx], d) for d, idx in sorted((-d, -i) for d, i in heap)]
+
+    def within(self, lat, lng, radius_km):
+        if not self.docs:
+            return []
+
+        hits = []
+        for indices, bound in self._candidates(lat, lng):
+            for idx in indices:
+                d = self._distance(lat, lng, idx)
+                if d <= radius_km:
+                    hits.append((d, idx))
+            if bound > radius_km:
+                break
+
+        return [(self.docs[idx], d) for d, idx in sorted(hits)]
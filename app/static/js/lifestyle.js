@@ -214,7 +214,7 @@ document.addEventListener("DOMContentLoaded", async () => {
 
         const tokens = q.split(/\s+/).filter(Boolean);
         const filtered = allEvents.filter((e) => {
-        const hay = `${e.title || ""} ${e.description || ""} ${e.location || ""}`.toLowerCase();
+        const hay = `${e.title || ""} ${e.summary || e.description || ""} ${e.location || ""}`.toLowerCase();
         return tokens.every((t) => hay.includes(t));
         });
 
@@ -243,6 +243,19 @@ document.addEventListener("DOMContentLoaded", async () => {
             return await res.json();
        }
 
+    // /api/user/optins comes a page at a time; follow next_cursor to the end
+    async function fetchAllOptins() {
+        const events = [];
+        let cursor = null;
+        do {
+            const query = cursor ? `?limit=100&cursor=${encodeURIComponent(cursor)}` : "?limit=100";
+            const page = await apiFetch(`/api/user/optins${query}`);
+            events.push(...(page.events || []));
+            cursor = page.next_cursor;
+        } while (cursor);
+        return events;
+    }
+
     // Toast notification
     function showToast(message, type = "success") {
         const toast = document.createElement("div");
@@ -291,15 +304,15 @@ document.addEventListener("DOMContentLoaded", async () => {
             }
 
             // Fetch user opt-ins once
-           apiFetch("/api/user/optins")
-            .then(data => {
-                userOptIns = data.events || [];
+           fetchAllOptins()
+            .then(events => {
+                userOptIns = events;
             })
             .catch(() => {
                 userOptIns = [];
             });
 
-            apiFetch(`/api/universities/nearest_with_events?lat=${latitude}&lng=${longitude}&limit=3`)
+            apiFetch(`/api/universities/nearest_with_events?lat=${latitude}&lng=${longitude}&limit=3&view=card`)
             .then(results => {
                 if (!results || results.length === 0) {
                     feedMessage.textContent = "No events nearby. Showing fallback events.";
@@ -323,7 +336,7 @@ document.addEventListener("DOMContentLoaded", async () => {
                 }
 
                 // ✅ Always fetch & render latest custom events
-                apiFetch(`/api/events?is_custom=1&limit=16&sort=latest`)
+                apiFetch(`/api/events?is_custom=1&limit=16&sort=latest&view=card`)
                     .then(customs => {
                         customEvents = Array.isArray(customs) ? customs : [];
                         renderCustomEvents(customEvents);
@@ -345,7 +358,7 @@ document.addEventListener("DOMContentLoaded", async () => {
 
 
                 // ✅ Still load custom events even on error
-                apiFetch(`/api/events?is_custom=1&limit=16&sort=latest`)
+                apiFetch(`/api/events?is_custom=1&limit=16&sort=latest&view=card`)
                     .then(customs => {
                         customEvents = Array.isArray(customs) ? customs : [];
                         renderCustomEvents(customEvents);
@@ -360,7 +373,7 @@ document.addEventListener("DOMContentLoaded", async () => {
             // console.error("Geolocation error:", error);
             feedMessage.textContent = "Location unavailable. Showing fallback events.";
             if (DEFAULT_UNI_LAT && DEFAULT_UNI_LNG) {
-                apiFetch(`/api/universities/nearest_with_events?lat=${DEFAULT_UNI_LAT}&lng=${DEFAULT_UNI_LNG}&limit=3`)
+                apiFetch(`/api/universities/nearest_with_events?lat=${DEFAULT_UNI_LAT}&lng=${DEFAULT_UNI_LNG}&limit=3&view=card`)
                     .then(showEvents)
                     .catch(() => showFallbackEvents(CURRENT_USER_UNIVERSITY));
             } else {
@@ -399,7 +412,7 @@ document.addEventListener("DOMContentLoaded", async () => {
         card.querySelector("span.bg-indigo-50").textContent = event.start_time
         ? new Date(event.start_time).toLocaleDateString("en-GB", { day: "numeric", month: "short" })
         : "TBA";
-        card.querySelector("p").textContent = event.description;
+        card.querySelector("p").textContent = event.summary ?? event.description;
         card.querySelector("div.flex span.text-green-400").textContent = event.location || event.university || "Location TBA";
 
         const ticketBtn = card.querySelector("button");
@@ -410,7 +423,15 @@ document.addEventListener("DOMContentLoaded", async () => {
             // Fill modal
             modalTitle.textContent = event.title;
             modalImage.src = event.image_url || "https://via.placeholder.com/400x200";
-            modalDescription.textContent = event.description;
+            modalDescription.textContent = event.summary ?? event.description;
+            // Cards carry a summary; the full description comes from the detail route
+            if (event.description === undefined) {
+                apiFetch(`/api/events/${event._id}`).then(full => {
+                    if (full.description !== undefined && modalTitle.textContent === event.title) {
+                        modalDescription.textContent = full.description;
+                    }
+                }).catch(() => {});
+            }
             modalCampus.textContent = event.location || event.university || "Location TBA";
             modalDate.textContent = event.start_time
                 ? new Date(event.start_time).toLocaleDateString("en-US", {
@@ -532,7 +553,7 @@ document.addEventListener("DOMContentLoaded", async () => {
     `;
 
     setTimeout(() => {
-      apiFetch(`/api/events?limit=8&sort=latest`)
+      apiFetch(`/api/events?limit=8&sort=latest&view=card`)
         .then(events => {
           setEvents(events, "Latest");
         })
@@ -613,7 +634,7 @@ document.addEventListener("DOMContentLoaded", async () => {
                 } else {
                     // Otherwise it isn't part of the current geofence: optionally leave feed alone
                     // and/or refresh latest fallback section:
-                    apiFetch(`/api/events?limit=8&sort=latest`).then(events => setEvents(events, "Latest"));
+                    apiFetch(`/api/events?limit=8&sort=latest&view=card`).then(events => setEvents(events, "Latest"));
                 }
                 }
             }
@@ -56,6 +56,32 @@ function renderEventCard(event, type) {
 }
 
 
+// /api/user/optins comes a page at a time; follow next_cursor to the end
+async function fetchAllOptins() {
+    const events = [];
+    let cursor = null;
+    do {
+        const query = cursor ? `?limit=100&cursor=${encodeURIComponent(cursor)}` : "?limit=100";
+        const page = await apiFetch(`/api/user/optins${query}`);
+        events.push(...(page.events || []));
+        cursor = page.next_cursor;
+    } while (cursor);
+    return events;
+}
+
+// Same for hosted events, past and archived ones included; /api/events puts its cursor in X-Next-Cursor
+async function fetchAllHosted() {
+    const events = [];
+    let cursor = null;
+    do {
+        const query = cursor ? `&cursor=${encodeURIComponent(cursor)}` : "";
+        const { data, res } = await apiRequest(`/api/events?hosted=1&include_ended=1&limit=100${query}`);
+        events.push(...(data || []));
+        cursor = res.headers.get("X-Next-Cursor");
+    } while (cursor);
+    return events;
+}
+
 async function loadProfileData() {
     try {
        // Show loaders
@@ -63,17 +89,17 @@ async function loadProfileData() {
         document.getElementById("hosted-loader").classList.remove("hidden");
 
         // Reservations
-        const optins = await apiFetch(`/api/user/optins`);
+        const reservations = await fetchAllOptins();
         document.getElementById("reservations-loader").classList.add("hidden");
         document.getElementById("reservations-feed").classList.remove("hidden");
-        if (optins.events?.length) {
-            optins.events.forEach(e => reservationsFeed.appendChild(renderEventCard(e, "reservation")));
+        if (reservations.length) {
+            reservations.forEach(e => reservationsFeed.appendChild(renderEventCard(e, "reservation")));
         } else {
             noReservations.classList.remove("hidden");
         }
 
        // Hosted events (no email exposed)
-        const events = await apiFetch(`/api/events?hosted=1`);
+        const events = await fetchAllHosted();
         document.getElementById("hosted-loader").classList.add("hidden");
         document.getElementById("hosted-feed").classList.remove("hidden");
         if (events.length) {
@@ -96,6 +122,11 @@ document.addEventListener("DOMContentLoaded", loadProfileData);
 
 // Global fetch wrapper with rate-limit + error handling
 async function apiFetch(url, options = {}) {
+    return (await apiRequest(url, options)).data;
+}
+
+// apiFetch that also hands back the response, for its headers
+async function apiRequest(url, options = {}) {
     const res = await fetch(url, {
         credentials: "include", // 👈 important for session cookies
         headers: { "Content-Type": "application/json" },
@@ -114,7 +145,7 @@ async function apiFetch(url, options = {}) {
         throw new Error(data?.error || `HTTP ${res.status}`);
     }
 
-    return data;
+    return { data, res };
 }
 
     
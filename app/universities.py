@@ -0,0 +1,125 @@
+import logging
+import threading
+
+from pymongo.errors import PyMongoError
+from app import db
+from app.forksafe import PerProcess
+from app.spatial import UniversityGrid
+
+log = logging.getLogger(__name__)
+
+# Fields the nearest-university endpoints return
+NEAREST_FIELDS = ("_id", "name", "latitude", "longitude", "type")
+
+
+def fold(name):
+    """Case- and whitespace-insensitive key for matching university names."""
+    return " ".join(str(name).split()).casefold()
+
+
+class _Snapshot:
+    """One immutable load of the universities collection, indexed for O(1) lookups."""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.by_domain = {}
+        self.by_name = {}
+        self.by_folded_name = {}
+        # setdefault keeps the first match in collection order, as find_one would
+        for doc in docs:
+            if doc.get("domain"):
+                self.by_domain.setdefault(str(doc["domain"]).lower(), doc)
+            if doc.get("name"):
+                self.by_name.setdefault(doc["name"], doc)
+                self.by_folded_name.setdefault(fold(doc["name"]), doc)
+
+        located = [
+            {k: doc[k] for k in NEAREST_FIELDS if k in doc}
+            for doc in docs
+            if doc.get("latitude") is not None and doc.get("longitude") is not None
+        ]
+        self.grid = UniversityGrid(located)
+
+
+class UniversityRegistry:
+    """Process-local cache of the ``universities`` collection.
+
+    Loaded in full on first use (the collection is small and changes rarely)
+    and reloaded by a background thread: on every change-stream event where
+    the deployment supports change streams, otherwise every
+    ``refresh_seconds``. Readers always see the last complete snapshot, so a
+    reload never blocks a request and lookups cost no round trips.
+    """
+
+    def __init__(self, refresh_seconds=300):
+        self.refresh_seconds = refresh_seconds
+        self._snap = None
+        self._loaded = PerProcess(self._start)
+        self._stale = threading.Event()
+
+    def _load(self):
+        return _Snapshot(list(db.universities.find({})))
+
+    def _start(self):
+        # Each worker loads its own copy and starts its own watcher
+        self._snap = self._load()
+        threading.Thread(target=self._watch, name="university-registry", daemon=True).start()
+
+    def _snapshot(self):
+        self._loaded.get()
+        return self._snap
+
+    def _reload(self):
+        try:
+            self._snap = self._load()
+        except PyMongoError:
+            pass  # keep serving the previous snapshot
+        except Exception:
+            log.exception("University registry reload failed")
+
+    def _watch(self):
+        try:
+            with db.universities.watch() as stream:
+                for _ in stream:
+                    self._reload()
+        except PyMongoError:
+            pass  # standalone mongod, or the stream died: poll from here on
+        except Exception:
+            log.exception("University registry change stream failed; polling instead")
+
+        while True:
+            self._stale.wait(self.refresh_seconds)
+            self._stale.clear()
+            self._reload()
+
+    def invalidate(self):
+        """Ask the background thread to reload now."""
+        self._stale.set()
+
+    def warm(self):
+        """Load this process's snapshot now rather than on the first lookup."""
+        self._snapshot()
+
+    def all(self):
+        return list(self._snapshot().docs)
+
+    def by_domain(self, domain):
+        return self._snapshot().by_domain.get((domain or "").lower().strip())
+
+    def by_name(self, name):
+        return self._snapshot().by_name.get(name)
+
+    def by_folded_name(self, name):
+        """Look up a name ignoring case and extra whitespace."""
+        return self._snapshot().by_folded_name.get(fold(name))
+
+    def nearest(self, lat, lng, k=1):
+        """The k closest universities as ``(doc, distance_km)``, closest first."""
+        return self._snapshot().grid.nearest(lat, lng, k)
+
+    def within(self, lat, lng, radius_km):
+        """Every university within ``radius_km`` as ``(doc, distance_km)``, closest first."""
+        return self._snapshot().grid.within(lat, lng, radius_km)
+
+
+universities = UniversityRegistry()
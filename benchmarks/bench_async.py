@@ -0,0 +1,269 @@
+"""Sync vs gevent serving throughput against a slow MongoDB.
+
+Starts a TCP proxy in front of a local mongod that delays every packet by
+half of --latency in each direction (so one round trip costs roughly
+--latency, like Atlas from our region). It then boots the app under
+gunicorn once per mode and drives it with 50/500/5000 concurrent
+connections:
+
+    sync    gunicorn sync workers, as deployed today
+    gthread sync workers with a thread pool each
+    gevent  gevent workers: blocking pymongo calls yield, and gather()
+            fans a request's independent queries out as greenlets
+
+    python -m benchmarks.bench_async
+    python -m benchmarks.bench_async --modes sync gevent --connections 50 500 5000 --latency 80
+
+Needs gunicorn and gevent installed and mongod on --mongo. Uses (and
+drops) a scratch database, comrades_bench by default.
+"""
+import argparse
+import asyncio
+import datetime
+import multiprocessing
+import os
+import random
+import resource
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+from flask import Flask
+from pymongo import MongoClient
+
+from app.indexes import ensure_indexes
+
+CAMPUSES = [
+    ("Strathmore University", "strathmore.edu", -1.3090, 36.8075),
+    ("University of Nairobi", "uonbi.ac.ke", -1.2801, 36.8163),
+    ("Kenyatta University", "ku.ac.ke", -1.1821, 36.9341),
+    ("Jomo Kenyatta University", "jkuat.ac.ke", -1.0912, 37.0117),
+    ("Moi University", "mu.ac.ke", 0.2827, 35.2920),
+]
+USER = "bench@strathmore.edu"
+
+
+def make_app():
+    """Gunicorn entry point: the real app with rate limits off (every request comes from one IP)."""
+    from app import create_app, limiter
+
+    app = create_app()
+    limiter.enabled = False
+    return app
+
+
+# -----------------------------
+# Latency-injecting proxy
+# -----------------------------
+async def _pipe(reader, writer, delay):
+    loop = asyncio.get_running_loop()
+    try:
+        while chunk := await reader.read(65536):
+            # Constant delay keeps chunks in order without holding up the next read
+            loop.call_later(delay, writer.write, chunk)
+    except ConnectionError:
+        pass
+    finally:
+        loop.call_later(delay, writer.close)
+
+
+async def _serve_proxy(listen_port, upstream, delay):
+    host, port = upstream.rsplit(":", 1)
+
+    async def handle(client_reader, client_writer):
+        try:
+            server_reader, server_writer = await asyncio.open_connection(host, int(port))
+        except OSError:
+            client_writer.close()
+            return
+        await asyncio.gather(_pipe(client_reader, server_writer, delay), _pipe(server_reader, client_writer, delay))
+
+    server = await asyncio.start_server(handle, "127.0.0.1", listen_port, backlog=4096)
+    async with server:
+        await server.serve_forever()
+
+
+def run_proxy(listen_port, upstream, latency_ms):
+    asyncio.run(_serve_proxy(listen_port, upstream, latency_ms / 2000))
+
+
+# -----------------------------
+# Load generator
+# -----------------------------
+async def _one_request(port, path, cookie):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        writer.write((f"GET {path} HTTP/1.1\r\nHost: bench\r\nCookie: session={cookie}\r\n"
+                      "Connection: close\r\n\r\n").encode())
+        await writer.drain()
+        data = await reader.read()
+        return data.startswith(b"HTTP/1.1 200") or data.startswith(b"HTTP/1.0 200")
+    finally:
+        writer.close()
+
+
+async def _drive(port, paths, cookie, connections, duration, timeout):
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + duration
+
+    async def client(i):
+        nonlocal errors
+        rng = random.Random(i)
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            try:
+                ok = await asyncio.wait_for(_one_request(port, rng.choice(paths), cookie), timeout)
+            except (OSError, asyncio.TimeoutError):
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - t0)
+            else:
+                errors += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(connections)))
+    return latencies, errors, time.perf_counter() - t0
+
+
+def session_cookie(secret_key):
+    """A signed Flask session for USER, so the per-user routes and fan-out run."""
+    app = Flask(__name__)
+    app.secret_key = secret_key
+    serializer = app.session_interface.get_signing_serializer(app)
+    return serializer.dumps({"user": {"email": USER, "name": "Bench", "picture": "",
+                                      "university": CAMPUSES[0][0]}})
+
+
+# -----------------------------
+# Setup
+# -----------------------------
+def seed(db, events_per_campus, rng):
+    db.universities.insert_many([
+        {"name": name, "domain": domain, "latitude": lat, "longitude": lng, "type": "Public"}
+        for name, domain, lat, lng in CAMPUSES
+    ])
+    now = datetime.datetime.utcnow()
+    events = []
+    for name, *_ in CAMPUSES:
+        for i in range(events_per_campus):
+            start = now + datetime.timedelta(hours=rng.randint(1, 24 * 60))
+            events.append({
+                "title": f"{name} event {i}", "description": "Bench event " * 20, "location": name,
+                "open_to": "everyone", "start_time": start, "end_time": start + datetime.timedelta(hours=3),
+                "ticket_price": 0.0, "is_free": True, "tickets_sold": 0, "capacity": None,
+                "is_custom_location": False, "service_fee": 0.0, "created_at": now, "created_by": USER,
+            })
+    ids = db.events.insert_many(events).inserted_ids
+    db.user_optins.insert_one({"email": USER, "events": rng.sample(ids, 20)})
+    ensure_indexes(db)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_http(port, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1) as s:
+                s.sendall(b"GET /api/universities/nearest?lat=0&lng=0 HTTP/1.1\r\nHost: bench\r\nConnection: close\r\n\r\n")
+                if s.recv(16).startswith(b"HTTP/"):
+                    return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"gunicorn didn't come up on port {port}")
+
+
+def start_gunicorn(mode, port, workers, threads, env):
+    # gunicorn.conf.py still applies; recycling workers mid-run would only add noise
+    cmd = [sys.executable, "-m", "gunicorn", "--bind", f"127.0.0.1:{port}", "--workers", str(workers),
+           "--backlog", "4096", "--log-level", "warning", "--timeout", "120", "--max-requests", "0"]
+    if mode == "sync":
+        cmd += ["--worker-class", "sync", "--threads", "1"]
+    elif mode == "gthread":
+        cmd += ["--worker-class", "gthread", "--threads", str(threads)]
+    elif mode == "gevent":
+        cmd += ["--worker-class", "gevent", "--worker-connections", "10000"]
+    cmd.append("benchmarks.bench_async:make_app()")
+    return subprocess.Popen(cmd, env=env, start_new_session=True)
+
+
+def run(args):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    client = MongoClient(args.mongo)
+    client.drop_database(args.db)
+    seed(client[args.db], args.events_per_campus, random.Random(args.seed))
+
+    proxy_port = free_port()
+    upstream = args.mongo.split("://", 1)[-1].split("/", 1)[0]
+    proxy = multiprocessing.Process(target=run_proxy, args=(proxy_port, upstream, args.latency), daemon=True)
+    proxy.start()
+
+    secret = "bench-secret"
+    env = dict(
+        os.environ,
+        MONGO_URI=f"mongodb://127.0.0.1:{proxy_port}/?directConnection=true",
+        MONGO_DB=args.db,
+        APP_SECRET_KEY=secret,
+        AUTH0_DOMAIN=os.getenv("AUTH0_DOMAIN", "bench.invalid"),
+        RESPONSE_CACHE="none",  # every request goes to MongoDB
+    )
+    cookie = session_cookie(secret)
+    lat, lng = CAMPUSES[0][2], CAMPUSES[0][3]
+    paths = [
+        f"/api/universities/nearest_with_events?lat={lat}&lng={lng}&limit=3&view=card",
+        "/api/events?limit=20&view=card",
+    ]
+
+    print(f"latency {args.latency} ms per round trip, {args.workers} workers, {args.duration}s per run")
+    print(f"{'mode':>8} {'conns':>6} {'req/s':>9} {'p50':>9} {'p99':>9} {'errors':>7}")
+    try:
+        for mode in args.modes:
+            port = free_port()
+            server = start_gunicorn(mode, port, args.workers, args.threads, env)
+            try:
+                wait_for_http(port)
+                for connections in args.connections:
+                    latencies, errors, elapsed = asyncio.run(
+                        _drive(port, paths, cookie, connections, args.duration, args.timeout))
+                    latencies.sort()
+                    p50 = latencies[len(latencies) // 2] * 1e3 if latencies else float("nan")
+                    p99 = latencies[int(len(latencies) * 0.99)] * 1e3 if latencies else float("nan")
+                    print(f"{mode:>8} {connections:>6} {len(latencies) / elapsed:>9.0f} "
+                          f"{p50:>7.0f}ms {p99:>7.0f}ms {errors:>7}")
+            finally:
+                os.killpg(server.pid, signal.SIGTERM)
+                server.wait()
+    finally:
+        proxy.terminate()
+        client.drop_database(args.db)
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="comrades_bench")
+    parser.add_argument("--modes", nargs="+", default=["sync", "gthread", "gevent"],
+                        choices=["sync", "gthread", "gevent"])
+    parser.add_argument("--connections", type=int, nargs="+", default=[50, 500, 5000])
+    parser.add_argument("--latency", type=float, default=80, help="injected MongoDB round-trip latency, ms")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8, help="threads per gthread worker")
+    parser.add_argument("--duration", type=float, default=15, help="seconds per run")
+    parser.add_argument("--timeout", type=float, default=30, help="per-request timeout, s")
+    parser.add_argument("--events-per-campus", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
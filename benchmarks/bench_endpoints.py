@@ -0,0 +1,342 @@
+"""Latency and MongoDB round trips for every API route, on generated data.
+
+Boots the real app with create_app, loads a generated dataset
+(app/seed.py) and sends each route --requests requests through
+Flask's test client, as a random signed-in student where the route needs
+one. Per route it reports latency percentiles, status codes and the
+MongoDB commands each request issued, by command and collection.
+
+    python -m benchmarks.bench_endpoints                        # small dataset, mongod on localhost
+    python -m benchmarks.bench_endpoints --scale medium --output endpoints.json
+    python -m benchmarks.bench_endpoints --events 1000000 --universities 5000 --users 100000
+    python -m benchmarks.bench_endpoints --mongo mongomock://    # in-process stand-in, no mongod
+
+Against mongod, commands are counted by a pymongo CommandListener, so
+getMores and the fan-out threads' queries are included. The mongomock
+stand-in has no wire protocol: collection method calls are counted
+instead. It also can't evaluate the card view's $substrCP projection, so
+list routes ask for view=full there, and anything else it doesn't
+implement (nearest_with_events' $firstN, for one) shows up as a 500. Use mongod for numbers worth comparing.
+
+The dataset is kept in --db (comrades_bench_<scale> by default) and reused
+by the next run of the same size; --reload rebuilds it and --drop removes
+it afterwards. The response cache is off unless --response-cache is given,
+so every request reaches MongoDB.
+"""
+import argparse
+import contextvars
+import functools
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from pymongo import MongoClient, monitoring
+
+from app.seed import SCALES, TITLE_WORDS, Dataset
+from config import Config
+
+# Commands issued by the request being measured, including from gather()'s
+# fan-out threads, which run in a copy of the caller's context
+_commands = contextvars.ContextVar("bench_commands", default=None)
+
+# Wire-protocol commands that aren't round trips the app asked for
+IGNORED_COMMANDS = {"endSessions", "hello", "isMaster", "ismaster", "ping"}
+
+
+class CommandCounter(monitoring.CommandListener):
+    def started(self, event):
+        commands = _commands.get()
+        if commands is None or event.command_name in IGNORED_COMMANDS:
+            return
+        target = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            target = event.command.get("collection")
+        commands[f"{event.command_name} {target}" if isinstance(target, str) else event.command_name] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+MONGOMOCK_METHODS = ("find", "find_one", "find_one_and_update", "aggregate", "insert_one", "insert_many",
+                     "update_one", "update_many", "bulk_write", "count_documents", "delete_one", "distinct")
+
+
+def count_mongomock_calls():
+    """Count mongomock collection calls as round trips (a find counts once however it's iterated)."""
+    from mongomock.collection import Collection
+
+    def counted(name, method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            commands = _commands.get()
+            if commands is not None:
+                commands[f"{name} {self.name}"] += 1
+            # find_one calls find, and so on: count only the outermost call
+            token = _commands.set(None)
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                _commands.reset(token)
+        return wrapper
+
+    for name in MONGOMOCK_METHODS:
+        setattr(Collection, name, counted(name, getattr(Collection, name)))
+
+
+# -----------------------------
+# Setup
+# -----------------------------
+def connect(args):
+    """(client, backend name) for --mongo."""
+    if args.mongo.startswith("mongomock://"):
+        import mongomock
+
+        count_mongomock_calls()
+        return mongomock.MongoClient(), "mongomock"
+    return MongoClient(args.mongo, event_listeners=[CommandCounter()]), "mongod"
+
+
+def make_app(args, client):
+    from app import create_app, db
+
+    settings = {
+        "SECRET_KEY": "bench-secret",
+        "AUTH0_DOMAIN": "bench.invalid",
+        "MONGO_URI": "mongodb://bench.invalid",  # unused: the app gets our client below
+        "MONGO_DB": args.db,
+        "WARM_UP": False,
+        "RESPONSE_CACHE": args.response_cache,
+        "RATELIMIT_ENABLED": False,  # every request comes from one address
+    }
+    app = create_app(type("BenchConfig", (Config,), settings))
+    db.use(client)
+    return app
+
+
+def session_cookies(app, dataset, count, rng):
+    """Signed session cookies for ``count`` random students, as auth.callback would set them."""
+    from app.auth import campus_context
+
+    serializer = app.session_interface.get_signing_serializer(app)
+    by_id = {str(u["_id"]): u for u in dataset.universities}
+    cookies = []
+    for index in rng.sample(range(dataset.user_count), min(count, dataset.user_count)):
+        user = dataset.user(index)
+        university = by_id[user["university_id"]]
+        cookies.append((user["email"], serializer.dumps({"user": {
+            "email": user["email"], "name": user["name"], "picture": "", "university": university["name"],
+            **campus_context(university),
+        }})))
+    return cookies
+
+
+class Context:
+    """What the request builders pick from: students, campuses, events, page-two cursors."""
+
+    def __init__(self, app, dataset, rng, users, view):
+        self.view = view
+        self.client = app.test_client(use_cookies=False)  # each request carries its own session
+        self.dataset = dataset
+        self.universities = dataset.universities
+        self.cookies = session_cookies(app, dataset, users, rng)
+        self.event_ids = [str(dataset.event_id(rng.randrange(dataset.event_count))) for _ in range(1000)]
+        self.cursors = []
+        for email, cookie in self.cookies[:50]:
+            response = self.request("GET", f"/api/events?view={view}&limit=20", cookie)
+            if response.headers.get("X-Next-Cursor"):
+                self.cursors.append((email, cookie, response.headers["X-Next-Cursor"]))
+
+    def request(self, method, path, cookie=None, body=None):
+        headers = {"Cookie": f"session={cookie}"} if cookie else {}
+        return self.client.open(path, method=method, headers=headers, json=body)
+
+
+# -----------------------------
+# Routes
+# -----------------------------
+# Each builder returns (path, signed-in user or None, JSON body or None)
+def _user(ctx, rng):
+    return rng.choice(ctx.cookies)
+
+
+def _near(ctx, rng):
+    uni = rng.choice(ctx.universities)
+    return uni["latitude"] + rng.uniform(-0.05, 0.05), uni["longitude"] + rng.uniform(-0.05, 0.05)
+
+
+def _create_body(rng):
+    start = (time.time() + rng.randint(1, 60) * 86400)
+    return {
+        "title": " ".join(rng.sample(TITLE_WORDS, 3)).title(),
+        "description": "Bench event. " * rng.randint(1, 30),
+        "campus": None, "location": "Sarit Expo Centre, Nairobi", "is_custom_location": True,
+        "start_time": time.strftime("%Y-%m-%dT%H:%M", time.gmtime(start)),
+        "end_time": time.strftime("%Y-%m-%dT%H:%M", time.gmtime(start + 3 * 3600)),
+        "is_free": False, "ticket_price": rng.choice([200, 500, 1000]), "capacity": rng.choice(["", 100]),
+    }
+
+
+ROUTES = [
+    ("auth.session", "GET", lambda ctx, rng: ("/auth/session", _user(ctx, rng), None)),
+    ("universities.validate_domain", "GET",
+     lambda ctx, rng: (f"/api/universities/validate-domain?domain={rng.choice(ctx.universities)['domain']}", None, None)),
+    ("universities.nearest", "GET",
+     lambda ctx, rng: ("/api/universities/nearest?lat={}&lng={}".format(*_near(ctx, rng)), None, None)),
+    ("universities.nearest_with_events", "GET",
+     lambda ctx, rng: ("/api/universities/nearest_with_events?lat={}&lng={}&limit=3&view={}".format(*_near(ctx, rng), ctx.view),
+                       _user(ctx, rng), None)),
+    ("events.upcoming", "GET", lambda ctx, rng: (f"/api/events?view={ctx.view}&limit=20", _user(ctx, rng), None)),
+    ("events.latest", "GET", lambda ctx, rng: (f"/api/events?view={ctx.view}&limit=20&sort=latest", _user(ctx, rng), None)),
+    ("events.next_page", "GET",
+     lambda ctx, rng: (lambda email, cookie, cursor: (f"/api/events?view={ctx.view}&limit=20&cursor={cursor}",
+                                                      (email, cookie), None))(*rng.choice(ctx.cursors))),
+    ("events.search", "GET",
+     lambda ctx, rng: (f"/api/events?view={ctx.view}&limit=20&search={rng.choice(TITLE_WORDS)}", _user(ctx, rng), None)),
+    ("events.custom", "GET", lambda ctx, rng: (f"/api/events?view={ctx.view}&limit=20&is_custom=1", _user(ctx, rng), None)),
+    ("events.hosted", "GET", lambda ctx, rng: (f"/api/events?view={ctx.view}&limit=20&hosted=1", _user(ctx, rng), None)),
+    ("events.detail", "GET", lambda ctx, rng: (f"/api/events/{rng.choice(ctx.event_ids)}", _user(ctx, rng), None)),
+    ("events.reserve", "POST",
+     lambda ctx, rng: (lambda user: (f"/api/events/{rng.choice(ctx.event_ids)}/reserve", user, {"email": user[0]}))(
+         _user(ctx, rng))),
+    ("events.create", "POST", lambda ctx, rng: ("/api/events/create", _user(ctx, rng), _create_body(rng))),
+    ("user.optins", "GET", lambda ctx, rng: (f"/api/user/optins?view={ctx.view}", _user(ctx, rng), None)),
+]
+
+
+# -----------------------------
+# Measurement
+# -----------------------------
+def percentile(values, q):
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def measure(ctx, method, build, requests, warmup, rng):
+    latencies, round_trips, statuses, commands = [], [], Counter(), Counter()
+    for i in range(warmup + requests):
+        path, user, body = build(ctx, rng)
+        counted = Counter()
+        token = _commands.set(counted)
+        try:
+            t0 = time.perf_counter()
+            response = ctx.request(method, path, user[1] if user else None, body)
+            response.get_data()
+            elapsed = time.perf_counter() - t0
+        finally:
+            _commands.reset(token)
+        if i < warmup:
+            continue
+        latencies.append(elapsed * 1e3)
+        round_trips.append(sum(counted.values()))
+        statuses[str(response.status_code)] += 1
+        commands.update(counted)
+
+    if not latencies:
+        return None
+    latencies.sort()
+    return {
+        "status": dict(statuses),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50), 3),
+            "p90": round(percentile(latencies, 0.90), 3),
+            "p99": round(percentile(latencies, 0.99), 3),
+            "mean": round(statistics.fmean(latencies), 3),
+            "max": round(latencies[-1], 3),
+        },
+        "round_trips": {"mean": round(statistics.fmean(round_trips), 2), "max": max(round_trips)},
+        "commands_per_request": {name: round(n / len(latencies), 2) for name, n in sorted(commands.items())},
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    sizes = dict(SCALES[args.scale])
+    for name in sizes:
+        if getattr(args, name) is not None:
+            sizes[name] = getattr(args, name)
+    args.db = args.db or f"comrades_bench_{args.scale}"
+    dataset = Dataset(seed=args.seed, **sizes)
+
+    client, backend = connect(args)
+    app = make_app(args, client)
+    db = client[args.db]
+    if args.reload or not dataset.is_loaded(db):
+        t0 = time.perf_counter()
+        client.drop_database(args.db)
+        dataset.load(db)
+        print(f"loaded {sizes} in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+
+    rng = random.Random(args.seed)
+    # mongomock can't build the card view's summary
+    view = args.view or ("full" if backend == "mongomock" else "card")
+    ctx = Context(app, dataset, rng, args.users_sampled, view)
+    routes = [r for r in ROUTES if not args.routes or r[0] in args.routes]
+    results = {}
+    print(f"{'route':<34} {'p50':>8} {'p99':>8} {'trips':>6}  status", file=sys.stderr)
+    for name, method, build in routes:
+        if name == "events.next_page" and not ctx.cursors:
+            continue  # too few events for a second page
+        result = measure(ctx, method, build, args.requests, args.warmup, rng)
+        results[name] = {"method": method, **result}
+        print(f"{name:<34} {result['latency_ms']['p50']:>6.1f}ms {result['latency_ms']['p99']:>6.1f}ms "
+              f"{result['round_trips']['mean']:>6.1f}  {result['status']}", file=sys.stderr)
+
+    if args.drop:
+        client.drop_database(args.db)
+    client.close()
+
+    output = json.dumps({
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "backend": backend,
+        "dataset": {**sizes, "seed": args.seed},
+        "view": view,
+        "response_cache": args.response_cache,
+        "requests_per_route": args.requests,
+        "routes": results,
+    }, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo", default="mongodb://localhost:27017/?directConnection=true",
+                        help="mongod URI, or mongomock:// for the in-process stand-in")
+    parser.add_argument("--db", help="database for the dataset (default comrades_bench_<scale>)")
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--events", type=int, help="override the scale's event count")
+    parser.add_argument("--universities", type=int, help="override the scale's university count")
+    parser.add_argument("--users", type=int, help="override the scale's user count")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per route")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests per route first")
+    parser.add_argument("--users-sampled", type=int, default=500, help="students the requests come from")
+    parser.add_argument("--routes", nargs="+", choices=[r[0] for r in ROUTES], help="only these routes")
+    parser.add_argument("--view", choices=["card", "full"],
+                        help="event view the list routes ask for (default card; full on mongomock)")
+    parser.add_argument("--response-cache", choices=["none", "memory"], default="none")
+    parser.add_argument("--reload", action="store_true", help="rebuild the dataset even if it's there")
+    parser.add_argument("--drop", action="store_true", help="drop the dataset afterwards")
+    parser.add_argument("--output", help="also write the JSON result here")
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Scalar vs vectorized nearest-campus ranking.
+
+Compares the old request path (Python haversine per campus + list.sort)
+against app.geo.CoordinateSet, for single queries and for a batch of
+query points such as an offline custom-location assignment job.
+
+    python -m benchmarks.bench_geo
+    python -m benchmarks.bench_geo --sizes 20 2000 50000 --queries 2000 --k 3
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from app.geo import CoordinateSet
+from app.spatial import haversine
+
+
+def random_campuses(n, rng):
+    # Rough bounding box of the African continent
+    return [{"latitude": rng.uniform(-35, 37), "longitude": rng.uniform(-18, 52)} for _ in range(n)]
+
+
+def scalar_nearest(campuses, lat, lng, k):
+    ranked = [(haversine(lat, lng, c["latitude"], c["longitude"]), i) for i, c in enumerate(campuses)]
+    ranked.sort()
+    return ranked[:k]
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(sizes, queries, k, repeat, seed):
+    rng = random.Random(seed)
+    print(f"{'campuses':>9} {'scalar/query':>14} {'numpy/query':>13} {'scalar batch':>13} {'numpy batch':>12} {'speedup':>8}")
+    for n in sizes:
+        campuses = random_campuses(n, rng)
+        points = [(rng.uniform(-35, 37), rng.uniform(-18, 52)) for _ in range(queries)]
+        coords = CoordinateSet.from_documents(campuses)
+        lats = np.array([p[0] for p in points])
+        lngs = np.array([p[1] for p in points])
+
+        # Sanity check: both paths agree on the nearest campus
+        for lat, lng in points[:20]:
+            want = scalar_nearest(campuses, lat, lng, 1)[0][1]
+            got = int(coords.nearest(lat, lng, 1)[0][0])
+            assert want == got or np.isclose(coords.distances(lat, lng)[want], coords.distances(lat, lng)[got])
+
+        lat0, lng0 = points[0]
+        single_scalar = timed(lambda: scalar_nearest(campuses, lat0, lng0, k), repeat)
+        single_numpy = timed(lambda: coords.nearest(lat0, lng0, k), repeat)
+
+        # The scalar batch is extrapolated from a sample to keep 50k x 2k runs short
+        sample = points[:max(1, min(queries, 200_000 // n))]
+        sample_time = timed(lambda: [scalar_nearest(campuses, a, b, k) for a, b in sample], 1)
+        batch_scalar = sample_time * queries / len(sample)
+        batch_numpy = timed(lambda: coords.nearest_many(lats, lngs, k), repeat)
+
+        print(f"{n:>9} {single_scalar * 1e3:>12.3f}ms {single_numpy * 1e3:>11.3f}ms "
+              f"{batch_scalar:>12.3f}s {batch_numpy:>11.3f}s {batch_scalar / batch_numpy:>7.0f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 2000, 50000])
+    parser.add_argument("--queries", type=int, default=2000, help="query points in the batch run")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    run(args.sizes, args.queries, args.k, args.repeat, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Event-list serialization: stdlib JSON provider vs the orjson one.
+
+The old path converts each datetime and ObjectId to a string in Python
+(the to_iso closure in serialize_event) and encodes with Flask's default
+provider. The new path hands BSON values straight to
+app.responses.FastJSONProvider. Both build a full ``jsonify`` response,
+ETag included, inside an app context.
+
+    python -m benchmarks.bench_json
+    python -m benchmarks.bench_json --sizes 1000 10000 --repeat 20
+"""
+import argparse
+import datetime
+import random
+import time
+
+from bson import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from app.responses import FastJSONProvider, body_etag
+
+
+class StdlibETagProvider(DefaultJSONProvider):
+    """The provider the app used before: stdlib json plus a body ETag."""
+
+    def response(self, *args, **kwargs):
+        response = super().response(*args, **kwargs)
+        response.set_etag(body_etag(response.get_data()))
+        return response
+
+
+def random_events(n, rng):
+    now = datetime.datetime(2025, 3, 1, 12, 0)
+    events = []
+    for i in range(n):
+        start = now + datetime.timedelta(minutes=rng.randrange(-60 * 24 * 90, 60 * 24 * 90))
+        events.append({
+            "_id": ObjectId(),
+            "title": f"Event {i}",
+            "description": "Live music, food trucks and a silent disco. " * rng.randint(1, 6),
+            "location": f"University {rng.randrange(200)}",
+            "open_to": "everyone",
+            "start_time": start,
+            "end_time": start + datetime.timedelta(hours=rng.randint(1, 6)),
+            "ticket_price": float(rng.choice([0, 200, 500, 1000])),
+            "is_free": False,
+            "image_url": f"https://cdn.example.com/events/{i}.jpg",
+            "created_by": f"organizer{rng.randrange(500)}@example.ac.ke",
+            "created_at": now - datetime.timedelta(minutes=rng.randrange(60 * 24 * 30)),
+            "tickets_sold": rng.randrange(300),
+            "capacity": rng.choice([None, 100, 500]),
+            "is_custom_location": rng.random() < 0.2,
+            "service_fee": 0.0,
+        })
+    return events
+
+
+def legacy_serialize(event):
+    def to_iso(val):
+        if val is None:
+            return None
+        if isinstance(val, str):
+            return val
+        if hasattr(val, "isoformat"):
+            return val.isoformat()
+        return str(val)
+
+    return {
+        "_id": str(event["_id"]),
+        "title": event.get("title"),
+        "description": event.get("description"),
+        "location": event.get("location"),
+        "open_to": event.get("open_to"),
+        "start_time": to_iso(event.get("start_time")),
+        "end_time": to_iso(event.get("end_time")),
+        "ticket_price": event.get("ticket_price"),
+        "is_free": event.get("is_free"),
+        "image_url": event.get("image_url"),
+        "created_by": event.get("created_by"),
+        "created_at": to_iso(event.get("created_at")),
+        "tickets_sold": int(event.get("tickets_sold", 0)),
+        "capacity": event.get("capacity"),
+        "is_custom_location": bool(event.get("is_custom_location", False)),
+        "service_fee": float(event.get("service_fee", 0.0)),
+        "reserved": False,
+    }
+
+
+def serialize(event):
+    return {
+        "_id": event["_id"],
+        "title": event.get("title"),
+        "description": event.get("description"),
+        "location": event.get("location"),
+        "open_to": event.get("open_to"),
+        "start_time": event.get("start_time"),
+        "end_time": event.get("end_time"),
+        "ticket_price": event.get("ticket_price"),
+        "is_free": event.get("is_free"),
+        "image_url": event.get("image_url"),
+        "created_by": event.get("created_by"),
+        "created_at": event.get("created_at"),
+        "tickets_sold": int(event.get("tickets_sold", 0)),
+        "capacity": event.get("capacity"),
+        "is_custom_location": bool(event.get("is_custom_location", False)),
+        "service_fee": float(event.get("service_fee", 0.0)),
+        "reserved": False,
+    }
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(sizes, repeat, seed):
+    rng = random.Random(seed)
+    legacy_app, app = Flask("legacy"), Flask("fast")
+    legacy_app.json = StdlibETagProvider(legacy_app)
+    app.json = FastJSONProvider(app)
+
+    print(f"{'events':>7} {'stdlib':>10} {'orjson':>10} {'speedup':>8} {'bytes':>10}")
+    for n in sizes:
+        events = random_events(n, rng)
+
+        with legacy_app.app_context():
+            before = legacy_app.json.response([legacy_serialize(e) for e in events])
+            legacy = timed(lambda: legacy_app.json.response([legacy_serialize(e) for e in events]), repeat)
+        with app.app_context():
+            after = app.json.response([serialize(e) for e in events])
+            fast = timed(lambda: app.json.response([serialize(e) for e in events]), repeat)
+
+        # Same document on the wire, whichever encoder produced it
+        assert before.get_json() == after.get_json()
+
+        print(f"{n:>7} {legacy * 1e3:>8.2f}ms {fast * 1e3:>8.2f}ms {legacy / fast:>7.1f}x {len(after.get_data()):>10,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    run(args.sizes, args.repeat, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Flash-sale contention benchmark for event reservations.
+
+Hundreds of threads reserve seats on one capped event at the same moment,
+against a local mongod, and the run checks that nothing was oversold and
+that tickets_sold matches the opt-ins actually recorded. It also fails on
+false sold-outs: someone was told SOLD_OUT while seats were left over.
+
+    python -m benchmarks.bench_reserve
+    python -m benchmarks.bench_reserve --threads 500 --capacity 100 --double-click 0.2
+    python -m benchmarks.bench_reserve --legacy   # the old read-then-write flow, for comparison
+
+Uses (and drops) a scratch database, comrades_bench by default.
+"""
+import argparse
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from pymongo import MongoClient
+
+from app.indexes import ensure_indexes
+from app.reservations import ALREADY_RESERVED, RESERVED, SOLD_OUT, reserve
+
+
+def legacy_reserve(db, event_id, email):
+    """The pre-atomic flow: find event, find opt-ins, $addToSet, $inc."""
+    event = db.events.find_one({"_id": event_id})
+    if event.get("capacity") is not None and event.get("tickets_sold", 0) >= event["capacity"]:
+        return SOLD_OUT
+    user = db.user_optins.find_one({"email": email})
+    if user and event_id in user.get("events", []):
+        return ALREADY_RESERVED
+    db.user_optins.update_one({"email": email}, {"$addToSet": {"events": event_id}}, upsert=True)
+    db.events.update_one({"_id": event_id}, {"$inc": {"tickets_sold": 1}})
+    return RESERVED
+
+
+def run(args):
+    client = MongoClient(args.uri, maxPoolSize=args.threads)
+    client.drop_database(args.db)
+    db = client[args.db]
+    ensure_indexes(db)
+
+    event_id = db.events.insert_one({
+        "title": "Flash sale",
+        "location": "Benchmark University",
+        "capacity": args.capacity,
+        "tickets_sold": 0,
+    }).inserted_id
+
+    # Some users click twice: their second attempt goes in as a separate request
+    rng = random.Random(args.seed)
+    emails = [f"student{i}@bench.test" for i in range(args.threads)]
+    attempts = emails + [e for e in emails if rng.random() < args.double_click]
+    rng.shuffle(attempts)
+
+    do_reserve = legacy_reserve if args.legacy else reserve
+    sale_opens = threading.Event()
+    latencies = []
+
+    def attempt(email):
+        sale_opens.wait()
+        t0 = time.perf_counter()
+        outcome = do_reserve(db, event_id, email)
+        latencies.append(time.perf_counter() - t0)
+        return outcome
+
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        futures = [pool.submit(attempt, email) for email in attempts]
+        time.sleep(0.5)  # let the workers line up behind the gate
+        t0 = time.perf_counter()
+        sale_opens.set()
+        outcomes = Counter(f.result() for f in futures)
+    elapsed = time.perf_counter() - t0
+
+    tickets_sold = db.events.find_one({"_id": event_id})["tickets_sold"]
+    optins = db.user_optins.count_documents({"events": event_id})
+    latencies.sort()
+
+    print(f"mode           {'legacy' if args.legacy else 'atomic'}")
+    print(f"attempts       {len(attempts)} ({len(attempts) - len(emails)} double-clicks) on {args.threads} threads")
+    print(f"capacity       {args.capacity}")
+    print(f"outcomes       {dict(outcomes)}")
+    print(f"tickets_sold   {tickets_sold}")
+    print(f"opt-ins        {optins}")
+    print(f"oversold       {max(0, optins - args.capacity)}")
+    print(f"counter drift  {tickets_sold - optins}")
+    print(f"false sold-out {outcomes[SOLD_OUT] if optins < args.capacity else 0}")
+    print(f"throughput     {len(attempts) / elapsed:,.0f} reservations/s")
+    print(f"latency        p50 {latencies[len(latencies) // 2] * 1e3:.1f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1e3:.1f} ms")
+
+    client.drop_database(args.db)
+    client.close()
+    false_sold_out = optins < args.capacity and outcomes[SOLD_OUT] > 0
+    return optins <= args.capacity and tickets_sold == optins and not false_sold_out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="comrades_bench")
+    parser.add_argument("--threads", type=int, default=300)
+    parser.add_argument("--capacity", type=int, default=100)
+    parser.add_argument("--double-click", type=float, default=0.1, help="share of users who click twice")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--legacy", action="store_true", help="benchmark the old read-then-write flow")
+    args = parser.parse_args()
+    raise SystemExit(0 if run(args) else 1)
+
+
+if __name__ == "__main__":
+    main()
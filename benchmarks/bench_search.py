@@ -0,0 +1,77 @@
+"""Event search latency over the seed dataset, unscoped and per feed scope.
+
+Builds app.search's index from Dataset events (no MongoDB needed) and
+times the best of --repeat runs of each query, as /events would issue
+it: up to SEARCH_MAX_RESULTS ids, unscoped, on the biggest campus, and
+on custom locations. Then times index updates: one new event, and
+removing a batch the way the archive job does.
+
+    python -m benchmarks.bench_search
+    python -m benchmarks.bench_search --events 200000 --queries "night" "career fa"
+"""
+import argparse
+import time
+
+from bson import ObjectId
+
+from app.search import _Index
+from app.seed import Dataset
+
+QUERIES = ["ni", "night", "music", "musci", "night p", "career fa", "gala derby", "free entry food"]
+LIMIT = 1000  # app.api.SEARCH_MAX_RESULTS
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run(events, queries, repeat, seed):
+    docs = Dataset(events=events, universities=20, users=1_000, seed=seed).events(0, events)
+    start = time.perf_counter()
+    index = _Index()
+    for doc in docs:
+        index.add(doc["_id"], doc)
+    index.publish()
+    print(f"built over {events:,} events in {time.perf_counter() - start:.1f}s")
+
+    campus = max((value for field, value in index.scopes if field == "location"),
+                 key=lambda value: len(index.scopes[("location", value)]))
+    scopes = {"all": None, "campus": {"location": campus}, "custom": {"is_custom_location": True}}
+    print(f"{'query':<18}" + "".join(f"{name:>16}" for name in scopes))
+    for query in queries:
+        cells = []
+        for scope in scopes.values():
+            seconds, hits = timed(lambda: index.search(query, LIMIT, scope), repeat)
+            cells.append(f"{seconds * 1e3:>8.2f}ms {len(hits):>5}")
+        print(f"{query!r:<18}" + "".join(f"{cell:>16}" for cell in cells))
+
+    def add_one():
+        index.add(ObjectId(), docs[0])
+        index.flush()
+
+    def remove_batch():
+        for doc in docs[:1000]:
+            index.remove(doc["_id"])
+        index.flush()
+
+    print(f"add one event: {timed(add_one, 1)[0] * 1e3:.1f}ms, "
+          f"remove 1000: {timed(remove_batch, 1)[0] * 1e3:.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=100_000)
+    parser.add_argument("--queries", nargs="+", default=QUERIES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    run(args.events, args.queries, args.repeat, args.seed)
+
+
+if __name__ == "__main__":
+    main()
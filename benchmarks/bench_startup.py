@@ -0,0 +1,195 @@
+"""Cold-start cost: import time, create_app, and time to first response.
+
+Measures, each in a fresh interpreter so nothing is cached between runs:
+
+    import      ``python -X importtime -c "import app"``; the total plus
+                the slowest top-level packages (cumulative)
+    create_app  wall time of create_app() after the imports
+    first 200   gunicorn spawn until GET /healthz answers 200
+    ready       gunicorn spawn until GET /readyz answers 200 (MongoDB
+                reached; caches keep warming in the background)
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --runs 10 --output startup.json
+
+Results are medians over --runs and can be written as JSON to compare
+across releases. The gunicorn timings need mongod on --mongo; readiness
+isn't waited for without it (--no-ready).
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+\d+ \|\s+(\d+) \| *(\S+)")
+
+CREATE_APP = """
+import time
+t0 = time.perf_counter()
+from app import create_app
+t1 = time.perf_counter()
+create_app()
+t2 = time.perf_counter()
+print((t1 - t0) * 1e3, (t2 - t1) * 1e3)
+"""
+
+
+def bench_env(args):
+    return dict(
+        os.environ,
+        MONGO_URI=args.mongo,
+        MONGO_DB=args.db,
+        APP_SECRET_KEY=os.getenv("APP_SECRET_KEY", "bench-secret"),
+        AUTH0_DOMAIN=os.getenv("AUTH0_DOMAIN", "bench.invalid"),
+    )
+
+
+# -----------------------------
+# In-process costs
+# -----------------------------
+def importtime(env, code):
+    """{module: cumulative ms} from one ``python -X importtime -c code`` run."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            env=env, capture_output=True, text=True, check=True)
+    return {match.group(2): int(match.group(1)) / 1e3
+            for match in map(IMPORTTIME_LINE.match, result.stderr.splitlines()) if match}
+
+
+def import_profile(env, top):
+    """ms for ``import app`` and the slowest top-level packages it pulls in."""
+    modules = importtime(env, "import app")
+    interpreter = importtime(env, "pass")  # site, encodings, ...: paid before app is imported
+    total = modules.pop("app", None)
+    # Cumulative, so flask includes werkzeug, jinja2, ...
+    packages = {name: ms for name, ms in modules.items() if "." not in name and name not in interpreter}
+    slowest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    return total, dict(slowest)
+
+
+def create_app_time(env):
+    result = subprocess.run([sys.executable, "-c", CREATE_APP], env=env, capture_output=True, text=True, check=True)
+    import_ms, create_ms = map(float, result.stdout.split())
+    return import_ms, create_ms
+
+
+# -----------------------------
+# gunicorn
+# -----------------------------
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def status(port, path):
+    try:
+        with socket.create_connection(("127.0.0.1", port), timeout=1) as s:
+            s.sendall(f"GET {path} HTTP/1.1\r\nHost: bench\r\nConnection: close\r\n\r\n".encode())
+            line = s.recv(16)
+    except OSError:
+        return None
+    parts = line.split()
+    return int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else None
+
+
+def wait_for(port, path, t0, timeout):
+    while time.perf_counter() - t0 < timeout:
+        if status(port, path) == 200:
+            return (time.perf_counter() - t0) * 1e3
+        time.sleep(0.005)
+    return None
+
+
+def gunicorn_times(env, wait_ready, timeout):
+    """Spawn one gunicorn worker; ms until /healthz and /readyz first answer 200."""
+    port = free_port()
+    cmd = [sys.executable, "-m", "gunicorn", "--bind", f"127.0.0.1:{port}", "--workers", "1",
+           "--log-level", "warning", "--max-requests", "0"]
+    t0 = time.perf_counter()
+    server = subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        first = wait_for(port, "/healthz", t0, timeout)
+        ready = wait_for(port, "/readyz", t0, timeout) if wait_ready and first is not None else None
+    finally:
+        server.terminate()
+        server.wait()
+    return first, ready
+
+
+# -----------------------------
+# Runner
+# -----------------------------
+def median(values):
+    values = [v for v in values if v is not None]
+    return round(statistics.median(values), 1) if values else None
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    env = bench_env(args)
+    imports, packages, app_imports, creates, firsts, readies = [], [], [], [], [], []
+    for i in range(args.runs):
+        total, slowest = import_profile(env, args.top)
+        imports.append(total)
+        packages.append(slowest)
+        import_ms, create_ms = create_app_time(env)
+        app_imports.append(import_ms)
+        creates.append(create_ms)
+        if not args.no_gunicorn:
+            first, ready = gunicorn_times(env, not args.no_ready, args.timeout)
+            firsts.append(first)
+            readies.append(ready)
+        print(f"run {i + 1}/{args.runs}: import {total:.0f} ms, create_app {create_ms:.0f} ms"
+              + (f", first 200 {first or float('nan'):.0f} ms, ready {ready or float('nan'):.0f} ms"
+                 if not args.no_gunicorn else ""), file=sys.stderr)
+
+    names = {name for run_packages in packages for name in run_packages}
+    slowest = {name: median([p.get(name) for p in packages]) for name in names}
+    result = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "runs": args.runs,
+        "median_ms": {
+            "import_app_importtime": median(imports),
+            "import_app_wall": median(app_imports),
+            "create_app": median(creates),
+            "first_response": median(firsts),
+            "ready": median(readies),
+        },
+        "slowest_imports_ms": dict(sorted(slowest.items(), key=lambda item: item[1], reverse=True)[:args.top]),
+    }
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo", default="mongodb://localhost:27017/?directConnection=true")
+    parser.add_argument("--db", default="comrades_bench")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="slowest top-level imports to report")
+    parser.add_argument("--timeout", type=float, default=60, help="seconds to wait for each probe")
+    parser.add_argument("--no-gunicorn", action="store_true", help="only measure imports and create_app")
+    parser.add_argument("--no-ready", action="store_true", help="don't wait for /readyz (no mongod)")
+    parser.add_argument("--output", help="also write the JSON result here")
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Application settings, read once from the environment (and .env).
+
+create_app() loads ``Config`` with ``app.config.from_object``. Every value
+can be overridden by an environment variable of the same name.
+"""
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def env_bool(name, default=False):
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+class Config:
+    SECRET_KEY = os.getenv("APP_SECRET_KEY")
+
+    # --- Auth0 ---
+    AUTH0_CLIENT_ID = os.getenv("AUTH0_CLIENT_ID")
+    AUTH0_CLIENT_SECRET = os.getenv("AUTH0_CLIENT_SECRET")
+    AUTH0_DOMAIN = os.getenv("AUTH0_DOMAIN")
+
+    # --- MongoDB connection ---
+    # MONGO_URI wins; otherwise an Atlas SRV URI is built from the parts
+    MONGO_URI = os.getenv("MONGO_URI")
+    MONGO_USER = os.getenv("MONGO_USER")
+    MONGO_PASSWORD = os.getenv("MONGO_PASSWORD")
+    MONGO_CLUSTER = os.getenv("MONGO_CLUSTER")
+    MONGO_DB = os.getenv("MONGO_DB")
+    MONGO_APP_NAME = os.getenv("MONGO_APP_NAME", "SomoCluster")
+
+    # --- MongoDB pool, per worker process ---
+    # Keep MONGO_MAX_POOL_SIZE >= gunicorn threads (or a gevent worker's
+    # expected in-flight queries); workers x pool must fit the cluster's
+    # connection limit. gunicorn.conf.py logs the total at startup.
+    MONGO_MAX_POOL_SIZE = env_int("MONGO_MAX_POOL_SIZE", 50)
+    MONGO_MIN_POOL_SIZE = env_int("MONGO_MIN_POOL_SIZE", 0)
+    # Close connections idle this long, so scaled-down traffic frees Atlas slots
+    MONGO_MAX_IDLE_TIME_MS = env_int("MONGO_MAX_IDLE_TIME_MS", 60_000)
+    # Fail a request that waits this long for a free pooled connection
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = env_int("MONGO_WAIT_QUEUE_TIMEOUT_MS", 2_000)
+    # pymongo's 30 s default ties a worker up far past any useful response
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = env_int("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5_000)
+    MONGO_CONNECT_TIMEOUT_MS = env_int("MONGO_CONNECT_TIMEOUT_MS", 10_000)
+    # First one both sides support is used; zstd needs the zstandard package
+    MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "zstd,zlib")
+    # "local" is cheapest; "majority" never returns writes that could roll back
+    MONGO_READ_CONCERN = os.getenv("MONGO_READ_CONCERN", "local")
+
+    # --- Startup ---
+    # Connect, check indexes and load caches on a background thread per
+    # worker (app/health.py); /readyz reports when that's done
+    WARM_UP = env_bool("WARM_UP", True)
+
+    # --- Metrics ---
+    # /metrics for Prometheus, scraped with "Authorization: Bearer <METRICS_TOKEN>".
+    # Without a token it answers 404, except in debug mode
+    METRICS = env_bool("METRICS", True)
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+    # Server-Timing header with MongoDB vs JSON time, for browser devtools.
+    # Unset means only in debug mode: it tells any client where time goes
+    SERVER_TIMING = env_bool("SERVER_TIMING", None)
+
+    # --- Query-plan audit (development only) ---
+    # Explain each new query shape a request issues and log the ones that
+    # examine more than QUERY_AUDIT_RATIO documents per document returned
+    QUERY_AUDIT = env_bool("QUERY_AUDIT")
+    QUERY_AUDIT_RATIO = env_int("QUERY_AUDIT_RATIO", 10)
+    QUERY_AUDIT_MIN_DOCS = env_int("QUERY_AUDIT_MIN_DOCS", 100)
+
+    # --- Event lifecycle (app/lifecycle.py) ---
+    # Feeds only show events that haven't ended. Every EVENT_ARCHIVE_INTERVAL
+    # seconds (0 turns it off), events that ended more than
+    # EVENT_ARCHIVE_AFTER_HOURS ago move to events_archive
+    EVENT_ARCHIVE_INTERVAL = env_int("EVENT_ARCHIVE_INTERVAL", 3600)
+    EVENT_ARCHIVE_AFTER_HOURS = env_int("EVENT_ARCHIVE_AFTER_HOURS", 24)
+    EVENT_ARCHIVE_BATCH = env_int("EVENT_ARCHIVE_BATCH", 1000)
+
+    # --- Ticket counter write-behind (off unless TICKET_COUNTER_BUFFER is set) ---
+    TICKET_COUNTER_BUFFER = env_bool("TICKET_COUNTER_BUFFER")
+    TICKET_COUNTER_FLUSH_MS = env_int("TICKET_COUNTER_FLUSH_MS", 200)
+    TICKET_COUNTER_MAX_OPS = env_int("TICKET_COUNTER_MAX_OPS", 500)
+
+    # --- Response cache for shared event feeds ---
+    RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "memory")  # memory | redis | none
+    RESPONSE_CACHE_URL = os.getenv("RESPONSE_CACHE_URL", "redis://localhost:6379/0")
+    RESPONSE_CACHE_TTL = env_int("RESPONSE_CACHE_TTL", 30)
+    RESPONSE_CACHE_STALE = env_int("RESPONSE_CACHE_STALE", 0)
+    RESPONSE_CACHE_SIZE = env_int("RESPONSE_CACHE_SIZE", 1024)
+
+    # --- JSON responses: compression ---
+    API_COMPRESS_MIN_BYTES = env_int("API_COMPRESS_MIN_BYTES", 1024)
+    API_GZIP_LEVEL = env_int("API_GZIP_LEVEL", 6)
+    API_BROTLI_QUALITY = env_int("API_BROTLI_QUALITY", 5)
+
+    # --- Rate limiting ---
+    # Counters live in shared storage so limits hold across gunicorn workers
+    # and hosts: redis://localhost:6379/1, or memcached://localhost:11211
+    # with RATELIMIT_STRATEGY=sliding-window-counter (memcached has no
+    # moving window). memory:// is per process and only fit for development.
+    RATELIMIT_STORAGE_URI = os.getenv("RATELIMIT_STORAGE_URI", "memory://")
+    RATELIMIT_STRATEGY = os.getenv("RATELIMIT_STRATEGY", "moving-window")
+    RATELIMIT_KEY_PREFIX = "comrades"
+    # A slow store must not hold up requests: give up quickly and fall back
+    # to counting per worker in memory rather than failing requests
+    RATELIMIT_STORAGE_TIMEOUT_MS = env_int("RATELIMIT_STORAGE_TIMEOUT_MS", 50)
+    RATELIMIT_IN_MEMORY_FALLBACK_ENABLED = True
+    RATELIMIT_SWALLOW_ERRORS = True
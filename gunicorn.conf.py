@@ -0,0 +1,87 @@
+"""Production gunicorn settings. gunicorn reads this file from the working directory:
+
+    gunicorn                              # gthread workers, sized from the CPU count
+    GUNICORN_WORKER_CLASS=gevent gunicorn # cooperative workers (see app/concurrency.py)
+
+Every setting can be overridden with the GUNICORN_* variable next to it,
+or on the command line.
+"""
+import glob
+import multiprocessing
+import os
+import tempfile
+
+from config import Config, env_bool, env_int
+
+wsgi_app = "run:app"
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+
+# --- Workers ---
+cpus = multiprocessing.cpu_count()
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")  # sync | gthread | gevent
+if worker_class == "gevent":
+    # One process per core; each overlaps worker_connections requests on its own
+    workers = env_int("GUNICORN_WORKERS", cpus)
+    worker_connections = env_int("GUNICORN_WORKER_CONNECTIONS", 1000)
+else:
+    workers = env_int("GUNICORN_WORKERS", cpus * 2 + 1)
+    # gunicorn turns sync workers into gthread ones if threads > 1
+    threads = env_int("GUNICORN_THREADS", 4 if worker_class == "gthread" else 1)
+
+# Recycle workers now and then so slow leaks can't build up; jitter keeps
+# them from all restarting at once
+max_requests = env_int("GUNICORN_MAX_REQUESTS", 2000)
+max_requests_jitter = env_int("GUNICORN_MAX_REQUESTS_JITTER", 200)
+timeout = env_int("GUNICORN_TIMEOUT", 30)
+graceful_timeout = env_int("GUNICORN_GRACEFUL_TIMEOUT", 30)
+keepalive = env_int("GUNICORN_KEEPALIVE", 5)
+
+# Off by default: each worker imports the app itself. GUNICORN_PRELOAD=1
+# imports it once in the master and forks it into gthread/sync workers
+# (MongoClient is still created per process, app/mongo.py). Never with
+# gevent: the master imports the app before the worker monkey-patches, so
+# the app's locks would be real OS locks, and a greenlet that yields while
+# holding one deadlocks the worker.
+preload_app = env_bool("GUNICORN_PRELOAD", False)
+
+# --- Metrics ---
+# Workers write their metrics to files here and /metrics sums them up
+# (prometheus_client's multiprocess mode). Must be set before the app is
+# imported. The previous run's *.db files are removed on every start so dead
+# workers' counts don't linger; nothing else in the directory is touched.
+metrics_dir = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR",
+                                    os.path.join(tempfile.gettempdir(), "comrades-metrics"))
+os.makedirs(metrics_dir, exist_ok=True)
+for stale in glob.glob(os.path.join(metrics_dir, "*.db")):
+    os.remove(stale)
+
+
+def when_ready(server):
+    # No app import here: the master would create the app's locks and import
+    # ssl before a gevent worker monkey-patches. The client is lazy anyway.
+    cfg = server.cfg
+    if cfg.preload_app and cfg.worker_class_str == "gevent":
+        server.log.warning("GUNICORN_PRELOAD with gevent workers can deadlock them; unset GUNICORN_PRELOAD")
+    pool = Config.MONGO_MAX_POOL_SIZE
+    server.log.info("%d %s workers, MongoDB pool %d each: up to %d connections from this host",
+                    cfg.workers, cfg.worker_class_str, pool, cfg.workers * pool)
+    if cfg.worker_class_str != "gevent" and pool < cfg.threads:
+        server.log.warning("MONGO_MAX_POOL_SIZE=%d is below %d threads per worker; "
+                           "requests will queue for connections", pool, cfg.threads)
+
+
+def post_worker_init(worker):
+    from app.health import warm_up
+
+    # Connect and load caches in the background as soon as the worker is up,
+    # so the first request doesn't wait on DNS or Atlas. This runs after the
+    # gevent worker has monkey-patched, so the warm-up is a greenlet there
+    app = worker.app.wsgi()
+    if app.config.get("WARM_UP", True):
+        warm_up.start(app)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)